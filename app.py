@@ -9,8 +9,12 @@ The AI Chat uses a hierarchical multi-agent architecture:
 """
 
 import asyncio
+
 import gradio as gr
-from src.agents.product_advisor_agent import create_product_advisor_agent
+from src.agents.product_advisor_agent import (
+    create_product_advisor_agent,
+    wait_for_background_tasks
+)
 from src.tools import agent_tools
 from dotenv import load_dotenv
 
@@ -19,21 +23,37 @@ load_dotenv(override=True)
 
 # Global agent instance and thread storage
 agent = None
+agent_lock = asyncio.Lock()
 user_threads = {}  # Store threads per user session
 
 
 async def initialize_agent():
     """Initialize the Product Advisor agent once at startup."""
     global agent
-    if agent is None:
-        print("Initializing Product Advisor Agent (Multi-Agent System)...")
-        print("  ├── PersonalizationAgent")
-        print("  └── ProductSearchAgent")
-        agent = await create_product_advisor_agent()
-        print("✓ All agents ready!")
+    async with agent_lock:
+        if agent is None:
+            print("Initializing Product Advisor Agent (Multi-Agent System)...")
+            print("  ├── PersonalizationAgent")
+            print("  └── ProductSearchAgent")
+            agent = await create_product_advisor_agent()
+            print("✓ All agents ready!")
     return agent
 
 
+async def warm_up_agent():
+    """
+    Build the agents when the page loads instead of on the first message.
+
+    Creating the agents also warms the search engine (index and embedding
+    model) in the background. No LLM call is made, so warming is free and
+    leaves conversation threads untouched.
+    """
+    try:
+        await initialize_agent()
+    except Exception as e:
+        print(f"⚠️ Agent warmup failed (will retry on first message): {e}")
+
+
 def get_or_create_thread(session_id: str = "default"):
     """Get or create a conversation thread for a user session."""
     global agent, user_threads
@@ -107,12 +127,43 @@ async def chat_with_agent(message: str, history: list, session_id: str = "defaul
         # Run agent with message using thread (maintains context)
         result = await agent.run(message, thread=thread)
 
+        # Let background preference saves finish before the event loop closes
+        await wait_for_background_tasks(agent)
+
         return result.text
 
     except Exception as e:
         return f"Error: {str(e)}"
 
 
+async def chat_with_agent_stream(message: str, session_id: str = "default"):
+    """
+    Stream the Product Advisor's reply as it is generated.
+
+    Yields the accumulated response text after each update, so the UI can
+    render tokens as they arrive instead of waiting for the whole turn.
+    """
+    if not message.strip():
+        yield "Please enter a message."
+        return
+
+    try:
+        await initialize_agent()
+        thread = get_or_create_thread(session_id)
+
+        text = ""
+        async for update in agent.run_stream(message, thread=thread):
+            if update.text:
+                text += update.text
+                yield text
+
+        # Let background preference saves finish before the turn ends
+        await wait_for_background_tasks(agent)
+
+    except Exception as e:
+        yield f"Error: {str(e)}"
+
+
 def get_catalog_stats() -> str:
     """Get catalog statistics."""
     try:
@@ -227,12 +278,13 @@ with gr.Blocks(title="Product Advisor") as demo:
                 inputs=chat_input,
             )
 
-            def chat_wrapper(message, history):
-                """Wrapper to handle async chat and format for Gradio."""
-                response = asyncio.run(chat_with_agent(message, history, session_id="gradio_default"))
+            async def chat_wrapper(message, history):
+                """Wrapper to stream the agent's reply into the Gradio chat."""
                 history.append({"role": "user", "content": message})
-                history.append({"role": "assistant", "content": response})
-                return history, ""
+                history.append({"role": "assistant", "content": ""})
+                async for partial in chat_with_agent_stream(message, session_id="gradio_default"):
+                    history[-1]["content"] = partial
+                    yield history, ""
 
             chat_btn.click(
                 fn=chat_wrapper,
@@ -323,6 +375,8 @@ with gr.Blocks(title="Product Advisor") as demo:
     **Cost**: Simple search is FREE. AI Chat uses LLM for orchestration.
     """)
 
+    demo.load(fn=warm_up_agent, inputs=None, outputs=None)
+
 
 if __name__ == "__main__":
     print("=" * 70)
@@ -21,67 +21,57 @@ Usage:
     result = await agent.run("Hi, I'm Sarah. I need a warm jacket", thread=thread)
 """
 
-from src.agents.personalization_agent import (
-    PersonalizationAgent,
-    create_personalization_agent,
-    get_user_preferences,
-    save_user_preferences,
-    process_user_feedback,
-    check_returning_user,
-    get_returning_user_prompt
-)
-
-from src.agents.product_search_agent import (
-    create_product_search_agent
-)
-
-from src.agents.product_advisor_agent import (
-    create_product_advisor_agent
-)
-
-from src.agents.memory import (
-    UserMemory,
-    get_memory
-)
-
-from src.agents.visual_formatting_tool import (
-    VisualFormattingTool,
-    VisualAgent,  # Backward compatibility alias
-    create_product_card,
-    create_comparison_table,
-    create_feature_matrix,
-    create_price_visualization,
-    format_product_list,
-    visualize_products
-)
-
-__all__ = [
+import importlib
+
+# Exported names and the submodule each comes from. They are imported on first
+# access (PEP 562), so importing one agent module doesn't load the others and
+# their dependencies (e.g. the search agent's ChromaDB client).
+_EXPORTS = {
     # Product Advisor Agent (Main Entry Point)
-    "create_product_advisor_agent",
+    "create_product_advisor_agent": "product_advisor_agent",
+    "close_product_advisor_agent": "product_advisor_agent",
 
     # Sub-Agents
-    "create_personalization_agent",
-    "create_product_search_agent",
+    "create_personalization_agent": "personalization_agent",
+    "create_product_search_agent": "product_search_agent",
 
     # Personalization Agent (class + convenience functions)
-    "PersonalizationAgent",
-    "get_user_preferences",
-    "save_user_preferences",
-    "process_user_feedback",
-    "check_returning_user",
-    "get_returning_user_prompt",
+    "PersonalizationAgent": "personalization_agent",
+    "get_user_preferences": "personalization_agent",
+    "save_user_preferences": "personalization_agent",
+    "process_user_feedback": "personalization_agent",
+    "check_returning_user": "personalization_agent",
+    "get_returning_user_prompt": "personalization_agent",
 
     # Memory
-    "UserMemory",
-    "get_memory",
+    "UserMemory": "memory",
+    "get_memory": "memory",
 
     # Visual Formatting Tool
-    "VisualFormattingTool",
-    "VisualAgent",  # Backward compatibility alias
-    "create_product_card",
-    "create_comparison_table",
-    "create_feature_matrix",
-    "create_price_visualization",
-    "format_product_list",
-    "visualize_products"
-]
+    "VisualFormattingTool": "visual_formatting_tool",
+    "VisualAgent": "visual_formatting_tool",  # Backward compatibility alias
+    "create_product_card": "visual_formatting_tool",
+    "create_comparison_table": "visual_formatting_tool",
+    "create_feature_matrix": "visual_formatting_tool",
+    "create_price_visualization": "visual_formatting_tool",
+    "format_product_list": "visual_formatting_tool",
+    "visualize_products": "visual_formatting_tool",
+}
+
+
+def __getattr__(name):
+    """Import an exported name from its submodule on first access."""
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module_name}"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    """List the lazy exports alongside the module's own names."""
+    return sorted(list(globals()) + list(_EXPORTS))
+
+
+__all__ = list(_EXPORTS)
@@ -0,0 +1,37 @@
+"""
+LLM provider selection shared by the agents.
+
+Each agent builds its own chat client; this module decides which provider
+the credentials point at, so every agent picks the same one.
+"""
+
+import functools
+import os
+from typing import Optional, Tuple
+
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+GITHUB_MODELS_BASE_URL = "https://models.inference.ai.azure.com"
+
+
+@functools.cache
+def resolve_provider() -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Detect the LLM provider from available credentials (resolved once per process).
+
+    The clients are configured explicitly from the result, so os.environ is
+    never modified.
+
+    Returns:
+        (provider, api_key, base_url), or (None, None, None) when no
+        credentials are set
+    """
+    # Try OpenAI first (preferred - higher rate limits)
+    openai_key = os.getenv("OPENAI_API_KEY")
+    if openai_key and not openai_key.startswith("ghp_"):
+        return "openai", openai_key, OPENAI_BASE_URL
+
+    # Fall back to GitHub Models (lower rate limits - 150/day)
+    github_token = os.getenv("GITHUB_TOKEN")
+    if github_token:
+        return "github", github_token, GITHUB_MODELS_BASE_URL
+    return None, None, None
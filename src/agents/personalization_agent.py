@@ -11,12 +11,15 @@ Uses the Microsoft Agent Framework to create an LLM-based agent
 with tools for memory operations.
 """
 
-import os
+import functools
+import importlib.util
 import re
-from typing import Any, Dict, List, Optional
+import threading
+from typing import Any, Dict, Final, List, Optional
 
 from dotenv import load_dotenv
 
+from .llm_provider import resolve_provider
 from .memory import get_memory
 
 # Load environment variables
@@ -37,6 +40,122 @@ COLD_CLIMATE_LOCATIONS = {
 }
 
 
+# Query keyword tables, in priority order within each field (first match wins;
+# colors collect every match)
+_QUERY_KEYWORDS: Dict[str, Dict[str, tuple]] = {
+    "activity": {
+        "hiking": ("hiking", "trail", "hike"),
+        "skiing": ("skiing", "ski", "slopes"),
+        "travel": ("travel", "trip", "vacation", "airport"),
+        "casual": ("casual", "everyday", "daily"),
+        "climbing": ("climbing", "climb", "alpine"),
+    },
+    "weather": {
+        "cold": ("winter", "cold", "snow", "freezing"),
+        "rainy": ("rain", "wet", "rainy"),
+        "warm": ("summer", "hot", "warm"),
+    },
+    "gender": {
+        "Women": ("women", "woman", "female", "ladies"),
+        "Men": ("men", "man", "male", "guys"),
+    },
+    "colors": {
+        color: (color,)
+        for color in ("blue", "black", "red", "green", "navy", "gray", "grey", "white", "brown")
+    },
+}
+
+# keyword -> (field, value), and one pattern that finds every keyword
+# occurrence (including overlapping ones) in a single scan
+_KEYWORD_INDEX: Dict[str, tuple] = {
+    keyword: (field, value)
+    for field, values in _QUERY_KEYWORDS.items()
+    for value, keywords in values.items()
+    for keyword in keywords
+}
+_KEYWORD_RE = re.compile(
+    "(?=(" + "|".join(
+        re.escape(kw) for kw in sorted(_KEYWORD_INDEX, key=len, reverse=True)
+    ) + "))"
+)
+
+# Longest query prefix scanned for context; bounds the cost of every pattern
+# match on pasted or adversarial input
+_MAX_QUERY_CHARS = 1000
+
+_BUDGET_DOLLAR_RE = re.compile(r'\$(\d+)')
+_BUDGET_UNDER_RE = re.compile(r'under\s+(\d+)')
+
+# Climates treated as cold weather, and weather that calls for outerwear
+COLD_CLIMATES = frozenset({"cold", "very_cold"})
+_OUTERWEAR_WEATHER = frozenset({"cold", "rainy", "unknown"})
+
+# Outfit search keywords by weather/activity (callers get fresh lists)
+_JACKET_WEATHER_KEYWORDS = {
+    "cold": ("insulated", "warm", "down"),
+    "rainy": ("waterproof", "rain"),
+}
+_JACKET_ACTIVITY_KEYWORDS = {
+    "hiking": ("hiking", "outdoor"),
+    "skiing": ("ski", "snow"),
+}
+_JACKET_DEFAULT_KEYWORDS = ("jacket", "outerwear")
+
+_PANTS_KEYWORDS = {
+    "hiking": ("hiking", "pants", "outdoor"),
+    "skiing": ("ski", "pants", "snow"),
+}
+_PANTS_DEFAULT_KEYWORDS = ("pants", "outdoor")
+
+_FOOTWEAR_KEYWORDS = {
+    "hiking": ("hiking", "boots", "trail"),
+    "skiing": ("boots", "winter"),
+}
+_FOOTWEAR_DEFAULT_KEYWORDS = ("boots", "shoes", "outdoor")
+
+
+@functools.lru_cache(maxsize=512)
+def _parse_query_cached(query_lower: str) -> Dict[str, Any]:
+    """Extract context from a normalized (lowercased) query; results are shared, don't mutate."""
+    context = {
+        "activity": "unknown",
+        "weather": "unknown",
+        "style": "casual",
+        "gender": None,
+        "budget": None,
+        "colors": []
+    }
+
+    # Keyword detection (activity, weather, gender, colors) in one pass
+    found = {_KEYWORD_INDEX[m.group(1)] for m in _KEYWORD_RE.finditer(query_lower)}
+    for field in ("activity", "weather", "gender"):
+        for value in _QUERY_KEYWORDS[field]:
+            if (field, value) in found:
+                context[field] = value
+                break
+    context["colors"] = [c for c in _QUERY_KEYWORDS["colors"] if ("colors", c) in found]
+
+    # Budget detection
+    budget_match = _BUDGET_DOLLAR_RE.search(query_lower)
+    if budget_match:
+        context["budget"] = float(budget_match.group(1))
+    elif "under" in query_lower:
+        budget_match = _BUDGET_UNDER_RE.search(query_lower)
+        if budget_match:
+            context["budget"] = float(budget_match.group(1))
+
+    return context
+
+
+def _parse_query(query: str) -> Dict[str, Any]:
+    """Parse a raw query via the cache, returning a context the caller may mutate."""
+    # Normalize so repeated queries differing only in case/spacing share a cache entry
+    key = " ".join(query[:_MAX_QUERY_CHARS].lower().split())
+    context = _parse_query_cached(key)
+    # Callers merge preferences into the result, so hand out a copy
+    return {**context, "colors": list(context["colors"])}
+
+
 def infer_climate(city: Optional[str] = None, region: Optional[str] = None) -> Optional[str]:
     """Infer climate from city or region name."""
     if city:
@@ -49,12 +168,10 @@ def infer_climate(city: Optional[str] = None, region: Optional[str] = None) -> O
             return climate
     return None
 
-# Try to import agent framework
-try:
-    from agent_framework.openai import OpenAIChatClient
-    AGENT_FRAMEWORK_AVAILABLE = True
-except ImportError:
-    AGENT_FRAMEWORK_AVAILABLE = False
+# Check for the agent framework without importing it; the rule-based
+# personalization path never needs it, so the import waits for the first
+# chat client (see _create_chat_client)
+AGENT_FRAMEWORK_AVAILABLE = importlib.util.find_spec("agent_framework") is not None
 
 
 class PersonalizationAgent:
@@ -250,57 +367,7 @@ class PersonalizationAgent:
 
     def _parse_query_context(self, query: str) -> Dict[str, Any]:
         """Parse natural language query to extract context."""
-        query_lower = query.lower()
-        context = {
-            "activity": "unknown",
-            "weather": "unknown",
-            "style": "casual",
-            "gender": None,
-            "budget": None,
-            "colors": []
-        }
-
-        # Activity detection
-        activities = {
-            "hiking": ["hiking", "trail", "hike"],
-            "skiing": ["skiing", "ski", "slopes"],
-            "travel": ["travel", "trip", "vacation", "airport"],
-            "casual": ["casual", "everyday", "daily"],
-            "climbing": ["climbing", "climb", "alpine"],
-        }
-        for activity, keywords in activities.items():
-            if any(kw in query_lower for kw in keywords):
-                context["activity"] = activity
-                break
-
-        # Weather detection
-        if any(w in query_lower for w in ["winter", "cold", "snow", "freezing"]):
-            context["weather"] = "cold"
-        elif any(w in query_lower for w in ["rain", "wet", "rainy"]):
-            context["weather"] = "rainy"
-        elif any(w in query_lower for w in ["summer", "hot", "warm"]):
-            context["weather"] = "warm"
-
-        # Gender detection
-        if any(g in query_lower for g in ["women", "woman", "female", "ladies"]):
-            context["gender"] = "Women"
-        elif any(g in query_lower for g in ["men", "man", "male", "guys"]):
-            context["gender"] = "Men"
-
-        # Budget detection
-        budget_match = re.search(r'\$(\d+)', query)
-        if budget_match:
-            context["budget"] = float(budget_match.group(1))
-        elif "under" in query_lower:
-            budget_match = re.search(r'under\s+(\d+)', query_lower)
-            if budget_match:
-                context["budget"] = float(budget_match.group(1))
-
-        # Color detection
-        colors = ["blue", "black", "red", "green", "navy", "gray", "grey", "white", "brown"]
-        context["colors"] = [c for c in colors if c in query_lower]
-
-        return context
+        return _parse_query(query)
 
     def _merge_user_preferences(
         self,
@@ -321,18 +388,20 @@ class PersonalizationAgent:
                 context["colors"] = outerwear_colors
 
         # Add fit preference
-        if user_prefs.get("sizing", {}).get("fit"):
-            context["fit"] = user_prefs["sizing"]["fit"]
+        fit = user_prefs.get("sizing", {}).get("fit")
+        if fit:
+            context["fit"] = fit
 
         # Add preferred brands
-        if user_prefs.get("general", {}).get("brands_liked"):
-            context["brands"] = user_prefs["general"]["brands_liked"]
+        brands_liked = general_prefs.get("brands_liked")
+        if brands_liked:
+            context["brands"] = brands_liked
 
         # Apply location-based weather inference
         location = user_prefs.get("location", {})
         if location and context.get("weather") == "unknown":
             climate = location.get("climate")
-            if climate in ("cold", "very_cold"):
+            if climate in COLD_CLIMATES:
                 context["weather"] = "cold"
             context["user_location"] = location.get("city", location.get("region"))
 
@@ -346,58 +415,48 @@ class PersonalizationAgent:
         activity = context.get("activity", "casual")
         weather = context.get("weather", "unknown")
 
+        # Filters are the same for every category; build once, copy per search
+        filters = self._build_filters(context)
+
         # Always include outerwear for cold/rainy weather
-        if weather in ["cold", "rainy", "unknown"]:
+        if weather in _OUTERWEAR_WEATHER:
             searches.append({
                 "category": "jacket",
                 "query_keywords": self._get_jacket_keywords(activity, weather),
-                "filters": self._build_filters(context)
+                "filters": filters.copy()
             })
 
         # Add pants/bottoms
         searches.append({
             "category": "pants",
             "query_keywords": self._get_pants_keywords(activity),
-            "filters": self._build_filters(context)
+            "filters": filters.copy()
         })
 
         # Add footwear
         searches.append({
             "category": "footwear",
             "query_keywords": self._get_footwear_keywords(activity),
-            "filters": self._build_filters(context)
+            "filters": filters.copy()
         })
 
         return searches
 
     def _get_jacket_keywords(self, activity: str, weather: str) -> List[str]:
         """Get jacket search keywords based on activity and weather."""
-        keywords = []
-        if weather == "cold":
-            keywords.extend(["insulated", "warm", "down"])
-        if weather == "rainy":
-            keywords.extend(["waterproof", "rain"])
-        if activity == "hiking":
-            keywords.extend(["hiking", "outdoor"])
-        elif activity == "skiing":
-            keywords.extend(["ski", "snow"])
-        return keywords if keywords else ["jacket", "outerwear"]
+        keywords = [
+            *_JACKET_WEATHER_KEYWORDS.get(weather, ()),
+            *_JACKET_ACTIVITY_KEYWORDS.get(activity, ()),
+        ]
+        return keywords if keywords else list(_JACKET_DEFAULT_KEYWORDS)
 
     def _get_pants_keywords(self, activity: str) -> List[str]:
         """Get pants search keywords based on activity."""
-        if activity == "hiking":
-            return ["hiking", "pants", "outdoor"]
-        if activity == "skiing":
-            return ["ski", "pants", "snow"]
-        return ["pants", "outdoor"]
+        return list(_PANTS_KEYWORDS.get(activity, _PANTS_DEFAULT_KEYWORDS))
 
     def _get_footwear_keywords(self, activity: str) -> List[str]:
         """Get footwear search keywords based on activity."""
-        if activity == "hiking":
-            return ["hiking", "boots", "trail"]
-        if activity == "skiing":
-            return ["boots", "winter"]
-        return ["boots", "shoes", "outdoor"]
+        return list(_FOOTWEAR_KEYWORDS.get(activity, _FOOTWEAR_DEFAULT_KEYWORDS))
 
     def _build_filters(self, context: Dict[str, Any]) -> Dict[str, Any]:
         """Build search filters from context."""
@@ -421,38 +480,78 @@ def _create_chat_client():
         raise RuntimeError(
             "Microsoft Agent Framework not installed. Run: pip install agent-framework"
         )
+    from agent_framework.openai import OpenAIChatClient
 
-    # Try OpenAI first (preferred - higher rate limits)
-    openai_key = os.getenv("OPENAI_API_KEY")
-    if openai_key and not openai_key.startswith("ghp_"):
-        # Clear any GitHub Models settings
-        if "OPENAI_BASE_URL" in os.environ:
-            del os.environ["OPENAI_BASE_URL"]
-        os.environ["OPENAI_CHAT_MODEL_ID"] = "gpt-4o-mini"
-        return OpenAIChatClient()
-
-    # Fall back to GitHub Models (lower rate limits - 150/day)
-    github_token = os.getenv("GITHUB_TOKEN")
-    if github_token:
-        os.environ["OPENAI_API_KEY"] = github_token
-        os.environ["OPENAI_BASE_URL"] = "https://models.inference.ai.azure.com"
-        os.environ["OPENAI_CHAT_MODEL_ID"] = "gpt-4o-mini"
-        return OpenAIChatClient()
+    provider, api_key, base_url = resolve_provider()
+    if provider is not None:
+        return OpenAIChatClient(model_id="gpt-4o-mini", api_key=api_key, base_url=base_url)
 
     raise RuntimeError(
         "No AI provider configured. Set OPENAI_API_KEY (preferred) or GITHUB_TOKEN."
     )
 
 
+# Personalization agent system prompt. Kept fully static (nothing per-user
+# is interpolated) so every request shares the same prompt prefix, which
+# providers can cache.
+_AGENT_INSTRUCTIONS: Final[str] = """You are a personalization data specialist. You manage user preferences as DATA.
+
+CRITICAL: Return STRUCTURED DATA only - do NOT ask questions or have conversations.
+The Product Advisor handles all user interaction. You just manage data.
+
+YOUR TASKS:
+
+1. IDENTIFY USER ("identify user Sarah"):
+   → Call identify_user(user_name)
+   → Return JSON with: is_new, user_id, and preferences if returning user
+   → Do NOT ask preference questions - just return what you have
+
+2. GET PREFERENCES ("get preferences for Sarah"):
+   → Call get_user_preferences(user_id)
+   → Return the raw preferences JSON
+
+3. SAVE PREFERENCES ("save Sarah's preferences: fit=slim, budget=500"):
+   → Parse the preferences from the request
+   → If location mentioned (city/state), use location_city and location_region params
+   → Call save_user_preferences() with permanent=True (default)
+   → Only use permanent=False if request says "just for today" or "session only"
+   → Return confirmation JSON
+
+4. RECORD FEEDBACK ("record feedback: too flashy"):
+   → Call record_user_feedback(user_id, feedback)
+   → Return the extracted signals
+
+OUTPUT FORMAT - Always return JSON:
+{"action": "identify", "is_new": true, "user_id": "sarah", "preferences": null}
+{"action": "identify", "is_new": false, "user_id": "sarah", "preferences": {"fit": "slim", "budget_max": 500}}
+{"action": "save", "success": true, "saved": {"fit": "relaxed"}}
+{"action": "feedback", "signals": [{"type": "avoid_style", "value": "bright_colors"}]}
+
+NEVER:
+- Ask questions back to the user
+- Generate preference questionnaires
+- Add commentary or conversation
+- Format as markdown or bullet points"""
+
+
 # Singleton instance
 _agent_instance = None
+_agent_instance_lock = threading.Lock()
 
 
 def _get_agent_instance() -> PersonalizationAgent:
-    """Get or create the PersonalizationAgent singleton."""
+    """
+    Get or create the PersonalizationAgent singleton.
+
+    Shared by the convenience functions below and the tool modules; the
+    instance holds only a reference to the memory store, so it is safe to
+    reuse across calls.
+    """
     global _agent_instance
     if _agent_instance is None:
-        _agent_instance = PersonalizationAgent()
+        with _agent_instance_lock:
+            if _agent_instance is None:
+                _agent_instance = PersonalizationAgent()
     return _agent_instance
 
 
@@ -622,44 +721,7 @@ async def create_personalization_agent():
 
     # Create the agent
     agent = chat_client.create_agent(
-        instructions="""You are a personalization data specialist. You manage user preferences as DATA.
-
-CRITICAL: Return STRUCTURED DATA only - do NOT ask questions or have conversations.
-The Product Advisor handles all user interaction. You just manage data.
-
-YOUR TASKS:
-
-1. IDENTIFY USER ("identify user Sarah"):
-   → Call identify_user(user_name)
-   → Return JSON with: is_new, user_id, and preferences if returning user
-   → Do NOT ask preference questions - just return what you have
-
-2. GET PREFERENCES ("get preferences for Sarah"):
-   → Call get_user_preferences(user_id)
-   → Return the raw preferences JSON
-
-3. SAVE PREFERENCES ("save Sarah's preferences: fit=slim, budget=500"):
-   → Parse the preferences from the request
-   → If location mentioned (city/state), use location_city and location_region params
-   → Call save_user_preferences() with permanent=True (default)
-   → Only use permanent=False if request says "just for today" or "session only"
-   → Return confirmation JSON
-
-4. RECORD FEEDBACK ("record feedback: too flashy"):
-   → Call record_user_feedback(user_id, feedback)
-   → Return the extracted signals
-
-OUTPUT FORMAT - Always return JSON:
-{"action": "identify", "is_new": true, "user_id": "sarah", "preferences": null}
-{"action": "identify", "is_new": false, "user_id": "sarah", "preferences": {"fit": "slim", "budget_max": 500}}
-{"action": "save", "success": true, "saved": {"fit": "relaxed"}}
-{"action": "feedback", "signals": [{"type": "avoid_style", "value": "bright_colors"}]}
-
-NEVER:
-- Ask questions back to the user
-- Generate preference questionnaires
-- Add commentary or conversation
-- Format as markdown or bullet points""",
+        instructions=_AGENT_INSTRUCTIONS,
         tools=[
             identify_user,
             get_user_preferences,
@@ -710,3 +772,18 @@ def get_returning_user_prompt(user_id: str) -> Optional[str]:
     """Get prompt for returning user confirmation."""
     agent = _get_agent_instance()
     return agent.get_returning_user_prompt(user_id)
+
+
+def parse_query_contexts(queries: List[str]) -> List[Dict[str, Any]]:
+    """
+    Parse many queries at once, e.g. to warm the cache from logged queries.
+
+    Duplicate queries (after normalization) are parsed only once.
+
+    Args:
+        queries: Natural language queries
+
+    Returns:
+        One context dict per query, in input order
+    """
+    return [_parse_query(query) for query in queries]
@@ -13,87 +13,527 @@ The Advisor decides when to:
 Uses the Microsoft Agent Framework to create the orchestrator.
 """
 
+import asyncio
+import functools
 import json
 import os
-from typing import Any, Dict, List, Optional
+import reprlib
+import sys
+import weakref
+from typing import Any, Dict, Final, List, Optional
 
 from dotenv import load_dotenv
 
-from src.agents.personalization_agent import create_personalization_agent
+from src.agents.llm_provider import resolve_provider
+from src.agents.personalization_agent import COLD_CLIMATES, create_personalization_agent
 from src.agents.product_search_agent import create_product_search_agent
+from src.agents.visual_formatting_tool import VisualFormattingTool
+from src.product_search import run_in_search_pool
+from src.tools.search_tools import (
+    get_product_details_async,
+    search_products
+)
 
 # Load environment variables
 load_dotenv(override=True)
 
+# Prefer orjson for serialization when available (C extension, much faster)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Try to import agent framework
 try:
+    import httpx
+    from agent_framework import ai_function
     from agent_framework.openai import OpenAIChatClient
+    from openai import AsyncOpenAI
     AGENT_FRAMEWORK_AVAILABLE = True
 except ImportError:
     AGENT_FRAMEWORK_AVAILABLE = False
 
 
+def _create_http_client() -> "httpx.AsyncClient":
+    """
+    Create the pooled HTTP client for one advisor agent's LLM calls.
+
+    Keeping connections alive avoids a fresh TCP+TLS handshake on every
+    sub-agent hop. Pooled connections belong to the event loop that opened
+    them, so each agent gets its own client (see close_product_advisor_agent).
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        timeout=httpx.Timeout(60.0, connect=10.0)
+    )
+
+
 def _create_chat_client():
-    """Create a chat client based on available credentials."""
+    """Create a chat client, with its own connection pool, based on available credentials."""
     if not AGENT_FRAMEWORK_AVAILABLE:
         raise RuntimeError(
             "Microsoft Agent Framework not installed. Run: pip install agent-framework"
         )
 
-    # Try OpenAI first (preferred - higher rate limits)
-    openai_key = os.getenv("OPENAI_API_KEY")
-    if openai_key and not openai_key.startswith("ghp_"):
-        # Clear any GitHub Models settings
-        if "OPENAI_BASE_URL" in os.environ:
-            del os.environ["OPENAI_BASE_URL"]
-        os.environ["OPENAI_CHAT_MODEL_ID"] = "gpt-4o-mini"
-        return OpenAIChatClient()
-
-    # Fall back to GitHub Models (lower rate limits - 150/day)
-    github_token = os.getenv("GITHUB_TOKEN")
-    if github_token:
-        os.environ["OPENAI_API_KEY"] = github_token
-        os.environ["OPENAI_BASE_URL"] = "https://models.inference.ai.azure.com"
-        os.environ["OPENAI_CHAT_MODEL_ID"] = "gpt-4o-mini"
-        return OpenAIChatClient()
+    provider, api_key, base_url = resolve_provider()
+    if provider is not None:
+        return OpenAIChatClient(
+            model_id="gpt-4o-mini",
+            async_client=AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=_create_http_client()
+            )
+        )
 
     raise RuntimeError(
         "No AI provider configured. Set OPENAI_API_KEY (preferred) or GITHUB_TOKEN."
     )
 
 
-# Initialize visual formatting tool singleton
-_visual_formatting_tool = None
+# Orchestrator system prompt. Kept as a static module constant so every
+# request starts with an identical prefix that the provider's prompt cache
+# can reuse; per-user state belongs in the user message, never in here.
+_SYSTEM_INSTRUCTIONS: Final[str] = """You are a Product Advisor - a friendly personal stylist for an outdoor apparel store.
+
+You coordinate two specialized agents:
+1. PersonalizationAgent - handles user memory and preferences
+2. ProductSearchAgent - handles product search
+
+CONVERSATION STYLE:
+- Be conversational and natural, NOT an interrogation
+- NEVER ask more than 1 question at a time
+- If user gives partial info, work with what you have
+- Prioritize helping with their request over gathering all preferences first
+
+FLOW:
+
+1. WHEN USER INTRODUCES THEMSELVES (with or without a request):
+   → FIRST: Use identify_user(user_name, location) - extract name AND location if mentioned
+   → THEN: If they mention color preferences, ALSO call save_user_preferences to save colors
+   → Examples:
+     - "Hi, I'm Sarah from Fargo" → identify_user("Sarah", location="Fargo")
+     - "Hi, I'm Sarah from Fargo. I need a blue jacket" →
+         1. identify_user("Sarah", location="Fargo")
+         2. save_user_preferences(user_id="sarah", outerwear_colors=["blue"])
+         3. Then search for jackets
+     - "I'm John, I want red boots" →
+         1. identify_user("John")
+         2. save_user_preferences(user_id="john", footwear_colors=["red"])
+         3. Then search for boots
+   → If returning: briefly mention saved preferences, ask what they need today
+   → If new: welcome them warmly
+
+2. WHEN USER ASKS FOR PRODUCTS ("I need a jacket for hiking"):
+   → If they mention a color preference, FIRST save it with save_user_preferences
+   → Then call call_product_search_agent(query) - it returns JSON with products
+   → Parse the JSON to extract the products array
+   → Call format_search_results(products) to create a nice formatted table
+   → DON'T stop to ask about fit, size, budget first
+   → If results would benefit from filters, ask ONE clarifying question naturally
+
+3. WHEN USER WANTS TO COMPARE PRODUCTS:
+   → Use create_comparison_table(product_ids) with the product IDs
+   → Use create_feature_matrix(product_ids) to show feature checkmarks
+
+4. WHEN USER ASKS ABOUT A SPECIFIC PRODUCT:
+   → Use create_product_card(product_id) for detailed view
+
+5. WHEN USER VOLUNTEERS PREFERENCES ("I like slim fit", "I prefer blue"):
+   → Use save_user_preferences(user_id, fit, location, outerwear_colors, footwear_colors, budget_max)
+   → IMPORTANT: For colors, pass as a list. Use outerwear_colors for jackets/coats, footwear_colors for boots/shoes
+   → Examples:
+     - "I like slim fit" → save_user_preferences(user_id="jen", fit="slim")
+     - "I'm from Seattle" → save_user_preferences(user_id="jen", location="Seattle")
+     - "I prefer blue jackets" → save_user_preferences(user_id="jen", outerwear_colors=["blue"])
+     - "I want red boots" → save_user_preferences(user_id="jen", footwear_colors=["red"])
+     - "I like black shoes" → save_user_preferences(user_id="jen", footwear_colors=["black"])
+     - "my budget is $200" → save_user_preferences(user_id="jen", budget_max=200)
+   → Acknowledge briefly - don't ask "is this your default?"
+
+6. WHEN USER GIVES FEEDBACK ("too flashy", "too expensive"):
+   → Record via save_preference_async("record feedback for <user>: <feedback>")
+   → Immediately show alternatives that address the feedback
+
+VISUALIZATION TOOLS (use these to format output!):
+- format_search_results(products) → formats product list as table
+- create_comparison_table(product_ids) → side-by-side comparison
+- create_product_card(product_id) → detailed single product view
+- create_feature_matrix(product_ids) → feature checkmark grid
+- create_price_analysis(...) → price statistics
+
+IMPORTANT RULES:
+- ALWAYS use visualization tools to format search results - don't just echo the JSON
+- Help first, gather preferences naturally through the conversation
+- One question at a time, max
+- If user skips a question, don't repeat it - move forward
+
+Be helpful, not bureaucratic!"""
+
+
+# Upper bound on concurrent sub-agent LLM calls per advisor agent, so
+# parallel tool dispatch doesn't trip provider rate limits
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "10"))
+
+
+# Fire-and-forget background tasks of each advisor agent (the sets hold
+# strong refs so running tasks aren't GC'd)
+_background_tasks = weakref.WeakKeyDictionary()
+
+
+def _fire_and_forget(coro, tasks: set) -> asyncio.Task:
+    """Schedule a coroutine in the background, tracked in tasks, without awaiting it."""
+    task = asyncio.create_task(coro)
+    tasks.add(task)
+    task.add_done_callback(tasks.discard)
+    return task
+
+
+async def wait_for_background_tasks(agent):
+    """
+    Wait for an advisor agent's pending fire-and-forget tasks to finish.
+
+    Only the given agent's tasks are awaited, so one agent's turn never
+    waits on writes scheduled by another. Call this before an event loop
+    shuts down (e.g. at the end of an asyncio.run() chat turn) so
+    background writes aren't cancelled.
+    """
+    tasks = _background_tasks.get(agent)
+    while tasks:
+        await asyncio.gather(*list(tasks), return_exceptions=True)
+
+
+def _dumps_compact(value: Any) -> str:
+    """Serialize a value to compact JSON (no indentation, minimal separators)."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(value, default=str).decode()
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+
+_SEARCH_TMPL: Final[str] = "Search: %s\n\nApply these user preferences when filtering:\n%s"
+
+
+@functools.lru_cache(maxsize=256)
+def _build_search_prompt(query: str, prefs_json: str = "") -> str:
+    """
+    Build the prompt sent to the ProductSearchAgent.
+
+    Cached on the (query, serialized preferences) pair so repeated identical
+    dispatches within a session skip formatting entirely.
+    """
+    if not prefs_json:
+        return f"Search: {query}"
+    return _SEARCH_TMPL % (query, prefs_json)
+
+
+# Background tool-call logging: records are queued and written in batches
+# by a single worker task so tool calls never block on stdout.
+_LOG_QUEUE_MAXSIZE = 1000
+_LOG_BATCH_SIZE = 64
+_log_queue = None
+_log_worker_task = None
+_log_loop = None
+
+
+def _flush_log_queue(queue: asyncio.Queue):
+    """Write any queued records synchronously."""
+    batch = []
+    while not queue.empty():
+        batch.append(queue.get_nowait())
+    if batch:
+        sys.stdout.write("".join(batch))
+        sys.stdout.flush()
+
+
+async def _log_worker(queue: asyncio.Queue):
+    """Drain the log queue, writing records in batches."""
+    try:
+        while True:
+            batch = [await queue.get()]
+            while not queue.empty() and len(batch) < _LOG_BATCH_SIZE:
+                batch.append(queue.get_nowait())
+            sys.stdout.write("".join(batch))
+            sys.stdout.flush()
+    except asyncio.CancelledError:
+        # Event loop is shutting down - don't lose pending records
+        _flush_log_queue(queue)
+        raise
+
+
+def _emit_log(record: str):
+    """Queue a log record for the background worker (direct write outside a loop)."""
+    global _log_queue, _log_worker_task, _log_loop
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        sys.stdout.write(record)
+        return
+
+    # The app runs each chat turn in a fresh event loop, so rebind per loop
+    if loop is not _log_loop or _log_worker_task is None or _log_worker_task.done():
+        _log_loop = loop
+        _log_queue = asyncio.Queue(maxsize=_LOG_QUEUE_MAXSIZE)
+        _log_worker_task = loop.create_task(_log_worker(_log_queue))
+
+    if _log_queue.full():
+        # Drop the oldest record rather than block the caller
+        _log_queue.get_nowait()
+    _log_queue.put_nowait(record)
+
+
+# Bounded repr for logging: stops descending into large containers instead
+# of stringifying them in full and throwing most of the text away
+_LOG_REPR = reprlib.Repr(maxstring=200, maxlist=3, maxdict=5, maxother=200)
+
+
+def _bounded_str(value: Any, limit: int = 200) -> str:
+    """Stringify a value for logging, truncated to roughly `limit` characters."""
+    text = value if isinstance(value, str) else _LOG_REPR.repr(value)
+    if len(text) > limit:
+        text = text[:limit] + "..."
+    return text
 
 
 def _log_tool_call(tool_name: str, inputs: dict, output: any):
     """Log tool calls to terminal with inputs and outputs."""
     separator = "=" * 60
-    print(f"\n{separator}")
-    print(f"🔧 TOOL CALL: {tool_name}")
-    print(separator)
-    print("📥 INPUTS:")
+    lines = [
+        f"\n{separator}",
+        f"🔧 TOOL CALL: {tool_name}",
+        separator,
+        "📥 INPUTS:",
+    ]
     for key, value in inputs.items():
-        # Truncate long values
-        str_value = str(value)
-        if len(str_value) > 200:
-            str_value = str_value[:200] + "..."
-        print(f"   {key}: {str_value}")
-    print("\n📤 OUTPUT:")
-    str_output = str(output)
-    if len(str_output) > 500:
-        str_output = str_output[:500] + "..."
-    print(f"   {str_output}")
-    print(f"{separator}\n")
-
-
-def _get_visual_formatting_tool():
-    """Get or create the VisualFormattingTool instance."""
-    global _visual_formatting_tool
-    if _visual_formatting_tool is None:
-        from src.agents.visual_formatting_tool import VisualFormattingTool
-        _visual_formatting_tool = VisualFormattingTool()
-    return _visual_formatting_tool
+        lines.append(f"   {key}: {_bounded_str(value, 200)}")
+    lines.append("\n📤 OUTPUT:")
+    lines.append(f"   {_bounded_str(output, 500)}")
+    lines.append(f"{separator}\n")
+    _emit_log("\n".join(lines) + "\n")
+
+
+# ============================================================================
+# VISUALIZATION TOOLS
+# ============================================================================
+# These don't depend on per-orchestrator state, so they live at module
+# scope and their tool schemas are built once at import.
+
+# Visual formatting tool shared by all visualization tools
+_VISUAL_TOOL = VisualFormattingTool()
+
+
+def format_search_results(
+    products: List[Dict[str, Any]],
+    show_details: bool = True
+) -> Dict[str, Any]:
+    """
+    Format a list of products as a markdown table.
+
+    Args:
+        products: List of product dictionaries (from search)
+        show_details: If True, show detailed table; if False, simple list
+
+    Returns:
+        Formatted markdown content
+    """
+    _log_tool_call(
+        "format_search_results",
+        {"products_count": len(products), "show_details": show_details},
+        "[processing...]"
+    )
+    try:
+        result = _VISUAL_TOOL.format_product_list(products, show_details)
+        _log_tool_call(
+            "format_search_results [RESULT]",
+            {"products_count": len(products)},
+            result
+        )
+        return result
+    except Exception as e:
+        return {"success": False, "content": "", "error": str(e)}
+
+
+async def create_comparison_table(
+    product_ids: List[str],
+    attributes: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Create a comparison table for multiple products.
+
+    Args:
+        product_ids: List of product IDs to compare (2-5)
+        attributes: Optional specific attributes to compare
+
+    Returns:
+        Markdown comparison table
+    """
+    _log_tool_call(
+        "create_comparison_table",
+        {"product_ids": product_ids, "attributes": attributes},
+        "[processing...]"
+    )
+    try:
+        # Fetch each distinct product once, concurrently
+        pids = list(dict.fromkeys(product_ids))[:5]
+        results = await asyncio.gather(*(get_product_details_async(pid) for pid in pids))
+        products = [
+            {**result['product'], 'product_id': pid}
+            for pid, result in zip(pids, results)
+            if result['success']
+        ]
+
+        if not products:
+            return {"success": False, "content": "", "error": "No valid products found"}
+
+        result = _VISUAL_TOOL.create_comparison_table(products, attributes)
+        _log_tool_call(
+            "create_comparison_table [RESULT]",
+            {"product_ids": product_ids},
+            result
+        )
+        return result
+    except Exception as e:
+        return {"success": False, "content": "", "error": str(e)}
+
+
+async def create_product_card(product_id: str) -> Dict[str, Any]:
+    """
+    Create a detailed product card for a single product.
+
+    Args:
+        product_id: The product ID
+
+    Returns:
+        Markdown product card
+    """
+    _log_tool_call("create_product_card", {"product_id": product_id}, "[processing...]")
+    try:
+        result = await get_product_details_async(product_id)
+        if not result['success']:
+            error_msg = result.get('error', 'Product not found')
+            return {"success": False, "content": "", "error": error_msg}
+
+        card_result = _VISUAL_TOOL.create_product_card(result['product'])
+        _log_tool_call(
+            "create_product_card [RESULT]",
+            {"product_id": product_id},
+            card_result
+        )
+        return card_result
+    except Exception as e:
+        return {"success": False, "content": "", "error": str(e)}
+
+
+async def create_feature_matrix(
+    product_ids: List[str],
+    features: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Create a feature matrix showing which products have which features.
+
+    Args:
+        product_ids: List of product IDs (up to 8)
+        features: Optional specific features to check
+
+    Returns:
+        Markdown feature matrix with checkmarks
+    """
+    _log_tool_call(
+        "create_feature_matrix",
+        {"product_ids": product_ids, "features": features},
+        "[processing...]"
+    )
+    try:
+        # Fetch each distinct product once, concurrently
+        pids = list(dict.fromkeys(product_ids))[:8]
+        results = await asyncio.gather(*(get_product_details_async(pid) for pid in pids))
+        products = [
+            {**result['product'], 'product_id': pid}
+            for pid, result in zip(pids, results)
+            if result['success']
+        ]
+
+        if not products:
+            return {"success": False, "content": "", "error": "No valid products found"}
+
+        matrix_result = _VISUAL_TOOL.create_feature_matrix(products, features)
+        _log_tool_call(
+            "create_feature_matrix [RESULT]",
+            {"product_ids": product_ids},
+            matrix_result
+        )
+        return matrix_result
+    except Exception as e:
+        return {"success": False, "content": "", "error": str(e)}
+
+
+async def create_price_analysis(
+    product_ids: Optional[List[str]] = None,
+    search_query: Optional[str] = None,
+    category: Optional[str] = None,
+    show_distribution: bool = True
+) -> Dict[str, Any]:
+    """
+    Create a price analysis visualization.
+
+    Args:
+        product_ids: Specific products to analyze
+        search_query: Or search for products to analyze
+        category: Or analyze a category
+        show_distribution: Show distribution chart
+
+    Returns:
+        Price analysis with statistics
+    """
+    _log_tool_call("create_price_analysis", {
+        "product_ids": product_ids,
+        "search_query": search_query,
+        "category": category,
+        "show_distribution": show_distribution
+    }, "[processing...]")
+    try:
+        products = []
+
+        if product_ids:
+            results = await asyncio.gather(
+                *(get_product_details_async(pid) for pid in product_ids)
+            )
+            products = [result['product'] for result in results if result['success']]
+        elif search_query:
+            result = await run_in_search_pool(search_products, search_query, max_results=50)
+            if result['success']:
+                products = result['products']
+        elif category:
+            result = await run_in_search_pool(
+                search_products, f"{category} products", max_results=50, category=category
+            )
+            if result['success']:
+                products = result['products']
+
+        if not products:
+            return {"success": False, "content": "", "error": "No products found"}
+
+        price_result = _VISUAL_TOOL.create_price_visualization(products, show_distribution)
+        _log_tool_call(
+            "create_price_analysis [RESULT]",
+            {"products_count": len(products)},
+            price_result
+        )
+        return price_result
+    except Exception as e:
+        return {"success": False, "content": "", "error": str(e)}
+
+
+_STATIC_TOOLS = [
+    format_search_results,
+    create_comparison_table,
+    create_product_card,
+    create_feature_matrix,
+    create_price_analysis,
+]
+if AGENT_FRAMEWORK_AVAILABLE:
+    # Pre-build the tool schemas (signature/docstring introspection)
+    _STATIC_TOOLS = [ai_function(func) for func in _STATIC_TOOLS]
 
 
 async def create_product_advisor_agent():
@@ -108,16 +548,29 @@ async def create_product_advisor_agent():
     """
     chat_client = _create_chat_client()
 
-    # Create sub-agents
+    # Create sub-agents (independent, so bootstrap them concurrently)
     print("Creating sub-agents...")
-    personalization_agent = await create_personalization_agent()
-    search_agent = await create_product_search_agent()
+    personalization_agent, search_agent = await asyncio.gather(
+        create_personalization_agent(),
+        create_product_search_agent(),
+        return_exceptions=False
+    )
     print("✓ Sub-agents created")
 
     # Create threads for sub-agents
     personalization_thread = personalization_agent.get_new_thread()
     search_thread = search_agent.get_new_thread()
 
+    # Serialize runs on each shared thread - parallel tool calls would
+    # otherwise interleave turns and corrupt the conversation state
+    personalization_lock = asyncio.Lock()
+    search_lock = asyncio.Lock()
+    # Created here rather than at import so it binds to the loop running
+    # this agent, not whichever loop first contended on a module global
+    llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    # Writes scheduled by save_preference_async (see wait_for_background_tasks)
+    background_tasks = set()
+
     # Track current user for auto-applying preferences
     current_user_id = None
 
@@ -214,7 +667,8 @@ async def create_product_advisor_agent():
         """
         nonlocal current_user_id
         _log_tool_call("call_personalization_agent", {"task": task}, "[calling sub-agent...]")
-        result = await personalization_agent.run(task, thread=personalization_thread)
+        async with personalization_lock, llm_semaphore:
+            result = await personalization_agent.run(task, thread=personalization_thread)
         _log_tool_call("call_personalization_agent [RESULT]", {"task": task}, result.text)
 
         # Track user_id if this was an identify task
@@ -226,6 +680,37 @@ async def create_product_advisor_agent():
 
         return result.text
 
+    async def save_preference_async(task: str) -> str:
+        """
+        Save preferences or record feedback in the background.
+
+        Use this for write-only personalization tasks where the user just
+        needs an acknowledgement:
+        - Saving preferences ("save Sarah's preferences: fit=relaxed")
+        - Recording feedback ("record feedback for Sarah: too flashy")
+
+        Returns immediately. Use call_personalization_agent when you need
+        the result (identifying users, reading preferences).
+
+        Args:
+            task: Description of the personalization write task
+
+        Returns:
+            Acknowledgement that the task was scheduled
+        """
+        _log_tool_call("save_preference_async", {"task": task}, "[scheduled in background]")
+
+        async def _run():
+            try:
+                async with personalization_lock, llm_semaphore:
+                    result = await personalization_agent.run(task, thread=personalization_thread)
+                _log_tool_call("save_preference_async [RESULT]", {"task": task}, result.text)
+            except Exception as e:
+                print(f"⚠️ Background personalization task failed: {e}")
+
+        _fire_and_forget(_run(), background_tasks)
+        return "Saved (async)."
+
     async def call_product_search_agent(
         query: str,
         user_context: Optional[Dict[str, Any]] = None
@@ -272,7 +757,7 @@ async def create_product_advisor_agent():
                         user_context["brands"] = general["brands_liked"]
 
                     location = user_prefs.get("location", {})
-                    if location.get("climate") in ("cold", "very_cold"):
+                    if location.get("climate") in COLD_CLIMATES:
                         user_context["weather"] = "cold"
                     if location.get("city"):
                         user_context["user_location"] = location["city"]
@@ -286,310 +771,38 @@ async def create_product_advisor_agent():
             {"query": query, "user_context": user_context},
             "[calling sub-agent...]"
         )
-        prompt = f"Search: {query}"
-        if user_context:
-            prefs_json = json.dumps(user_context, indent=2)
-            prompt += f"\n\nApply these user preferences when filtering:\n{prefs_json}"
+        # Compact JSON - indentation only costs the LLM tokens
+        prompt = _build_search_prompt(
+            query, _dumps_compact(user_context) if user_context else ""
+        )
 
-        result = await search_agent.run(prompt, thread=search_thread)
+        async with search_lock, llm_semaphore:
+            result = await search_agent.run(prompt, thread=search_thread)
         _log_tool_call("call_product_search_agent [RESULT]", {"query": query}, result.text)
         return result.text
 
-    # Define visualization tools
-    def format_search_results(
-        products: List[Dict[str, Any]],
-        show_details: bool = True
-    ) -> Dict[str, Any]:
-        """
-        Format a list of products as a markdown table.
-
-        Args:
-            products: List of product dictionaries (from search)
-            show_details: If True, show detailed table; if False, simple list
-
-        Returns:
-            Formatted markdown content
-        """
-        _log_tool_call(
-            "format_search_results",
-            {"products_count": len(products), "show_details": show_details},
-            "[processing...]"
-        )
-        try:
-            agent = _get_visual_formatting_tool()
-            result = agent.format_product_list(products, show_details)
-            _log_tool_call(
-                "format_search_results [RESULT]",
-                {"products_count": len(products)},
-                result
-            )
-            return result
-        except Exception as e:
-            return {"success": False, "content": "", "error": str(e)}
-
-    def create_comparison_table(
-        product_ids: List[str],
-        attributes: Optional[List[str]] = None
-    ) -> Dict[str, Any]:
-        """
-        Create a comparison table for multiple products.
-
-        Args:
-            product_ids: List of product IDs to compare (2-5)
-            attributes: Optional specific attributes to compare
-
-        Returns:
-            Markdown comparison table
-        """
-        _log_tool_call(
-            "create_comparison_table",
-            {"product_ids": product_ids, "attributes": attributes},
-            "[processing...]"
-        )
-        try:
-            from src.tools.search_tools import get_product_details
-
-            products = []
-            for pid in product_ids[:5]:
-                result = get_product_details(pid)
-                if result['success']:
-                    product = result['product']
-                    product['product_id'] = pid
-                    products.append(product)
-
-            if not products:
-                return {"success": False, "content": "", "error": "No valid products found"}
-
-            agent = _get_visual_formatting_tool()
-            result = agent.create_comparison_table(products, attributes)
-            _log_tool_call(
-                "create_comparison_table [RESULT]",
-                {"product_ids": product_ids},
-                result
-            )
-            return result
-        except Exception as e:
-            return {"success": False, "content": "", "error": str(e)}
-
-    def create_product_card(product_id: str) -> Dict[str, Any]:
-        """
-        Create a detailed product card for a single product.
-
-        Args:
-            product_id: The product ID
-
-        Returns:
-            Markdown product card
-        """
-        _log_tool_call("create_product_card", {"product_id": product_id}, "[processing...]")
-        try:
-            from src.tools.search_tools import get_product_details
-
-            result = get_product_details(product_id)
-            if not result['success']:
-                error_msg = result.get('error', 'Product not found')
-                return {"success": False, "content": "", "error": error_msg}
-
-            agent = _get_visual_formatting_tool()
-            card_result = agent.create_product_card(result['product'])
-            _log_tool_call(
-                "create_product_card [RESULT]",
-                {"product_id": product_id},
-                card_result
-            )
-            return card_result
-        except Exception as e:
-            return {"success": False, "content": "", "error": str(e)}
-
-    def create_feature_matrix(
-        product_ids: List[str],
-        features: Optional[List[str]] = None
-    ) -> Dict[str, Any]:
-        """
-        Create a feature matrix showing which products have which features.
-
-        Args:
-            product_ids: List of product IDs (up to 8)
-            features: Optional specific features to check
-
-        Returns:
-            Markdown feature matrix with checkmarks
-        """
-        _log_tool_call(
-            "create_feature_matrix",
-            {"product_ids": product_ids, "features": features},
-            "[processing...]"
-        )
-        try:
-            from src.tools.search_tools import get_product_details
-
-            products = []
-            for pid in product_ids[:8]:
-                result = get_product_details(pid)
-                if result['success']:
-                    product = result['product']
-                    product['product_id'] = pid
-                    products.append(product)
-
-            if not products:
-                return {"success": False, "content": "", "error": "No valid products found"}
-
-            agent = _get_visual_formatting_tool()
-            matrix_result = agent.create_feature_matrix(products, features)
-            _log_tool_call(
-                "create_feature_matrix [RESULT]",
-                {"product_ids": product_ids},
-                matrix_result
-            )
-            return matrix_result
-        except Exception as e:
-            return {"success": False, "content": "", "error": str(e)}
-
-    def create_price_analysis(
-        product_ids: Optional[List[str]] = None,
-        search_query: Optional[str] = None,
-        category: Optional[str] = None,
-        show_distribution: bool = True
-    ) -> Dict[str, Any]:
-        """
-        Create a price analysis visualization.
-
-        Args:
-            product_ids: Specific products to analyze
-            search_query: Or search for products to analyze
-            category: Or analyze a category
-            show_distribution: Show distribution chart
-
-        Returns:
-            Price analysis with statistics
-        """
-        _log_tool_call("create_price_analysis", {
-            "product_ids": product_ids,
-            "search_query": search_query,
-            "category": category,
-            "show_distribution": show_distribution
-        }, "[processing...]")
-        try:
-            from src.tools.search_tools import get_product_details, search_products
-
-            products = []
-
-            if product_ids:
-                for pid in product_ids:
-                    result = get_product_details(pid)
-                    if result['success']:
-                        products.append(result['product'])
-            elif search_query:
-                result = search_products(search_query, max_results=50)
-                if result['success']:
-                    products = result['products']
-            elif category:
-                result = search_products(f"{category} products", max_results=50)
-                if result['success']:
-                    products = [p for p in result['products'] if p.get('category') == category]
-
-            if not products:
-                return {"success": False, "content": "", "error": "No products found"}
-
-            agent = _get_visual_formatting_tool()
-            price_result = agent.create_price_visualization(products, show_distribution)
-            _log_tool_call(
-                "create_price_analysis [RESULT]",
-                {"products_count": len(products)},
-                price_result
-            )
-            return price_result
-        except Exception as e:
-            return {"success": False, "content": "", "error": str(e)}
-
     # Create the orchestrator agent
     agent = chat_client.create_agent(
-        instructions="""You are a Product Advisor - a friendly personal stylist for an outdoor apparel store.
-
-You coordinate two specialized agents:
-1. PersonalizationAgent - handles user memory and preferences
-2. ProductSearchAgent - handles product search
-
-CONVERSATION STYLE:
-- Be conversational and natural, NOT an interrogation
-- NEVER ask more than 1 question at a time
-- If user gives partial info, work with what you have
-- Prioritize helping with their request over gathering all preferences first
-
-FLOW:
-
-1. WHEN USER INTRODUCES THEMSELVES (with or without a request):
-   → FIRST: Use identify_user(user_name, location) - extract name AND location if mentioned
-   → THEN: If they mention color preferences, ALSO call save_user_preferences to save colors
-   → Examples:
-     - "Hi, I'm Sarah from Fargo" → identify_user("Sarah", location="Fargo")
-     - "Hi, I'm Sarah from Fargo. I need a blue jacket" →
-         1. identify_user("Sarah", location="Fargo")
-         2. save_user_preferences(user_id="sarah", outerwear_colors=["blue"])
-         3. Then search for jackets
-     - "I'm John, I want red boots" →
-         1. identify_user("John")
-         2. save_user_preferences(user_id="john", footwear_colors=["red"])
-         3. Then search for boots
-   → If returning: briefly mention saved preferences, ask what they need today
-   → If new: welcome them warmly
-
-2. WHEN USER ASKS FOR PRODUCTS ("I need a jacket for hiking"):
-   → If they mention a color preference, FIRST save it with save_user_preferences
-   → Then call call_product_search_agent(query) - it returns JSON with products
-   → Parse the JSON to extract the products array
-   → Call format_search_results(products) to create a nice formatted table
-   → DON'T stop to ask about fit, size, budget first
-   → If results would benefit from filters, ask ONE clarifying question naturally
-
-3. WHEN USER WANTS TO COMPARE PRODUCTS:
-   → Use create_comparison_table(product_ids) with the product IDs
-   → Use create_feature_matrix(product_ids) to show feature checkmarks
-
-4. WHEN USER ASKS ABOUT A SPECIFIC PRODUCT:
-   → Use create_product_card(product_id) for detailed view
-
-5. WHEN USER VOLUNTEERS PREFERENCES ("I like slim fit", "I prefer blue"):
-   → Use save_user_preferences(user_id, fit, location, outerwear_colors, footwear_colors, budget_max)
-   → IMPORTANT: For colors, pass as a list. Use outerwear_colors for jackets/coats, footwear_colors for boots/shoes
-   → Examples:
-     - "I like slim fit" → save_user_preferences(user_id="jen", fit="slim")
-     - "I'm from Seattle" → save_user_preferences(user_id="jen", location="Seattle")
-     - "I prefer blue jackets" → save_user_preferences(user_id="jen", outerwear_colors=["blue"])
-     - "I want red boots" → save_user_preferences(user_id="jen", footwear_colors=["red"])
-     - "I like black shoes" → save_user_preferences(user_id="jen", footwear_colors=["black"])
-     - "my budget is $200" → save_user_preferences(user_id="jen", budget_max=200)
-   → Acknowledge briefly - don't ask "is this your default?"
-
-6. WHEN USER GIVES FEEDBACK ("too flashy", "too expensive"):
-   → Record via personalization agent
-   → Immediately show alternatives that address the feedback
-
-VISUALIZATION TOOLS (use these to format output!):
-- format_search_results(products) → formats product list as table
-- create_comparison_table(product_ids) → side-by-side comparison
-- create_product_card(product_id) → detailed single product view
-- create_feature_matrix(product_ids) → feature checkmark grid
-- create_price_analysis(...) → price statistics
-
-IMPORTANT RULES:
-- ALWAYS use visualization tools to format search results - don't just echo the JSON
-- Help first, gather preferences naturally through the conversation
-- One question at a time, max
-- If user skips a question, don't repeat it - move forward
-
-Be helpful, not bureaucratic!""",
+        instructions=_SYSTEM_INSTRUCTIONS,
         tools=[
             identify_user,
             save_user_preferences,
             call_personalization_agent,
+            save_preference_async,
             call_product_search_agent,
-            format_search_results,
-            create_comparison_table,
-            create_product_card,
-            create_feature_matrix,
-            create_price_analysis,
+            *_STATIC_TOOLS,
         ]
     )
+    _background_tasks[agent] = background_tasks
 
     return agent
+
+
+async def close_product_advisor_agent(agent) -> None:
+    """
+    Close the connection pool of an agent from create_product_advisor_agent.
+
+    Call this from the agent's owner, on the event loop the agent ran on,
+    once the agent is no longer needed.
+    """
+    await agent.chat_client.client.close()
@@ -12,16 +12,28 @@ Uses the Microsoft Agent Framework to create an LLM-based agent
 with search tools.
 """
 
+import functools
+import hashlib
+import json
 import os
-from typing import Any, Dict, Optional
+import threading
+from typing import Any, Dict, Final, List, Optional
 
 from dotenv import load_dotenv
 
-from src.product_search import ProductSearch
+from src.agents.llm_provider import resolve_provider
+from src.product_search import ProductSearch, run_in_search_pool
 
 # Load environment variables
 load_dotenv(override=True)
 
+# Prefer orjson for serialization when available (C extension, much faster)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Try to import agent framework
 try:
     from agent_framework.openai import OpenAIChatClient
@@ -30,24 +42,132 @@ except ImportError:
     AGENT_FRAMEWORK_AVAILABLE = False
 
 
+# Optional Chroma server (e.g. "http://localhost:8000"); local ./chroma_db otherwise
+CHROMA_SERVER_URL = os.getenv("CHROMA_SERVER_URL") or None
+
 # Initialize the search engine (singleton pattern)
 _search_engine = None
+_search_engine_lock = threading.Lock()
 
 
 def _get_search_engine() -> ProductSearch:
-    """Get or create the ProductSearch engine instance."""
+    """Get or create the ProductSearch engine instance (thread-safe)."""
     global _search_engine
     if _search_engine is None:
-        try:
-            _search_engine = ProductSearch(db_path="./chroma_db")
-        except Exception as e:
-            raise RuntimeError(
-                f"Failed to initialize ProductSearch. Ensure ChromaDB is set up. "
-                f"Run 'python src/load_products.py' first. Error: {e}"
-            ) from e
+        with _search_engine_lock:
+            if _search_engine is None:
+                try:
+                    _search_engine = ProductSearch(
+                        db_path="./chroma_db",
+                        server_url=CHROMA_SERVER_URL
+                    )
+                except Exception as e:
+                    raise RuntimeError(
+                        f"Failed to initialize ProductSearch. Ensure ChromaDB is set up. "
+                        f"Run 'python src/load_products.py' first. Error: {e}"
+                    ) from e
+                threading.Thread(
+                    target=_warm_search_engine, args=(_search_engine,), daemon=True
+                ).start()
     return _search_engine
 
 
+def _warm_search_engine(engine: ProductSearch) -> None:
+    """
+    Touch the collection and run a throwaway query in the background.
+
+    Loads the HNSW index, metadata pages, and embedding model so the first
+    real search does not pay the cold-start cost. The query goes straight to
+    the collection, so no result cache is filled with warmup results.
+    Failures are ignored; the first real search will surface them.
+    """
+    try:
+        engine.collection.get(limit=1, include=["metadatas"])
+        engine.collection.query(
+            query_embeddings=[engine.embed_query("warmup")],
+            n_results=1,
+            include=[],
+        )
+    except Exception:
+        pass
+
+
+# Tool arguments that map to ChromaDB metadata filters
+_EQ_FIELDS = ("brand", "category", "subcategory", "gender", "season", "waterproofing", "insulation")
+_RANGE_FIELDS = (
+    ("min_price", "price_usd", "$gte"),
+    ("max_price", "price_usd", "$lte"),
+    ("min_rating", "rating", "$gte"),
+)
+
+
+def _normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace, and cap length so equivalent queries embed identically."""
+    return " ".join(query.lower().split())[:512]
+
+
+
+def _build_filter(**values: Any) -> Optional[Dict[str, Any]]:
+    """
+    Translate tool filter arguments into a ChromaDB where clause.
+
+    Equality fields are skipped when falsy and range bounds when None.
+
+    Returns:
+        None when no filter applies, the single condition when only one
+        does, otherwise an $and of all conditions
+    """
+    conditions = [
+        {field: {"$eq": values[field]}}
+        for field in _EQ_FIELDS if values.get(field)
+    ] + [
+        {field: {op: values[arg]}}
+        for arg, field, op in _RANGE_FIELDS if values.get(arg) is not None
+    ]
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
+
+# Product fields returned by default; the full metadata row is much larger and
+# ends up verbatim in the Advisor's context window
+_PRODUCT_PROJECTION = (
+    "product_id", "product_name", "brand", "category", "subcategory",
+    "gender", "color", "price_usd", "rating", "similarity_score",
+)
+
+
+def _project(products: List[Dict[str, Any]], fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Reduce product dicts to the default projection plus any requested fields."""
+    keep = _PRODUCT_PROJECTION + tuple(fields) if fields else _PRODUCT_PROJECTION
+    return [{k: p[k] for k in keep if k in p} for p in products]
+
+
+def _dumps_compact(value: Any) -> str:
+    """Serialize a value to compact JSON (no indentation, minimal separators)."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(value, default=str).decode()
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+
+def _json_tool(func):
+    """
+    Wrap an async tool so it returns its result already serialized.
+
+    The agent framework passes string results through unchanged, so this
+    replaces its recursive walk + stdlib json.dumps with one orjson call.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return _dumps_compact(await func(*args, **kwargs))
+    return wrapper
+
+
+_chat_client = None
+_chat_client_lock = threading.Lock()
+
+
 def _create_chat_client():
     """Create a chat client based on available credentials."""
     if not AGENT_FRAMEWORK_AVAILABLE:
@@ -55,42 +175,101 @@ def _create_chat_client():
             "Microsoft Agent Framework not installed. Run: pip install agent-framework"
         )
 
-    # Try OpenAI first (preferred - higher rate limits)
-    openai_key = os.getenv("OPENAI_API_KEY")
-    if openai_key and not openai_key.startswith("ghp_"):
-        # Clear any GitHub Models settings
-        if "OPENAI_BASE_URL" in os.environ:
-            del os.environ["OPENAI_BASE_URL"]
-        os.environ["OPENAI_CHAT_MODEL_ID"] = "gpt-4o-mini"
-        return OpenAIChatClient()
-
-    # Fall back to GitHub Models (lower rate limits - 150/day)
-    github_token = os.getenv("GITHUB_TOKEN")
-    if github_token:
-        os.environ["OPENAI_API_KEY"] = github_token
-        os.environ["OPENAI_BASE_URL"] = "https://models.inference.ai.azure.com"
-        os.environ["OPENAI_CHAT_MODEL_ID"] = "gpt-4o-mini"
-        return OpenAIChatClient()
+    provider, api_key, base_url = resolve_provider()
+    if provider is not None:
+        return OpenAIChatClient(model_id="gpt-4o-mini", api_key=api_key, base_url=base_url)
 
     raise RuntimeError(
         "No AI provider configured. Set OPENAI_API_KEY (preferred) or GITHUB_TOKEN."
     )
 
 
+def _get_chat_client():
+    """Get or create the shared chat client (thread-safe)."""
+    global _chat_client
+    if _chat_client is None:
+        with _chat_client_lock:
+            if _chat_client is None:
+                _chat_client = _create_chat_client()
+    return _chat_client
+
+
+# Search agent system prompt, built once at import
+_AGENT_INSTRUCTIONS: Final[str] = """You are a product search specialist for an outdoor apparel store.
+
+Your job is to:
+1. Search for products based on user queries (use search_products for semantic search)
+2. Apply filters when user specifies constraints (brand, price, gender, etc.)
+3. Use search_with_filters for combined semantic + filter searches
+4. Find similar products when requested
+5. Provide product details when asked about specific items
+   (use get_product_details_batch when you need several products at once)
+
+SEARCH STRATEGY:
+- For vague queries ("warm jacket") → use search_products
+- For specific constraints ("women's jacket under $200") → use search_with_filters
+- For browsing ("show me NorthPeak products") → use filter_products_by_attributes
+- For alternatives ("something like this one") → use find_similar_products
+
+CRITICAL - OUTPUT FORMAT:
+- Return the RAW JSON output from search tools directly
+- Do NOT format results as markdown, tables, or bullet points
+- Do NOT add commentary or descriptions around the JSON
+- Just return the tool's JSON output as-is
+- The Advisor agent will handle all formatting and visualization
+
+Example response (just return this, nothing else):
+{"success": true, "total_results": 5, "products": [...]}
+
+IMPORTANT:
+- You will receive user context (preferences, sizing, budget) from the Advisor
+- Apply this context to your searches using filters
+- Search results carry summary fields only; pass fields=[...] (e.g. "waterproofing",
+  "insulation", "material") when the request depends on other attributes
+- Focus ONLY on search tasks - don't handle personalization"""
+
+
+# Built agents, keyed by a fingerprint of the provider credentials
+_agent_cache: Dict[str, Any] = {}
+_agent_cache_lock = threading.Lock()
+
+
+def _agent_cache_key() -> str:
+    """Fingerprint the credentials the chat client is built from."""
+    provider, api_key, _ = resolve_provider()
+    credentials = f"{provider or ''}\0{api_key or ''}"
+    return hashlib.sha256(credentials.encode()).hexdigest()
+
+
 async def create_product_search_agent():
     """
     Create a ProductSearchAgent as an LLM-powered agent.
 
+    The agent holds no conversation state (that lives in threads), so one
+    instance is built per set of credentials and reused by later calls.
+
     Returns:
         Agent instance with product search tools
     """
-    chat_client = _create_chat_client()
+    key = _agent_cache_key()
+    with _agent_cache_lock:
+        agent = _agent_cache.get(key)
+        if agent is None:
+            agent = _agent_cache[key] = _build_product_search_agent()
+    return agent
+
+
+def _build_product_search_agent():
+    """Build a new ProductSearchAgent with its search tools."""
+    chat_client = _get_chat_client()
+    search = _get_search_engine()
 
     # Define search tool functions
-    def search_products(
+    async def search_products(
         query: str,
         max_results: int = 10,
-        min_similarity: float = 0.0
+        min_similarity: float = 0.0,
+        fields: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """
         Search for products using natural language query (semantic search).
@@ -103,22 +282,25 @@ async def create_product_search_agent():
                             "lightweight waterproof hiking gear"
             max_results: Maximum products to return (1-50, default: 10)
             min_similarity: Minimum similarity threshold (0.0-1.0)
+            fields: Extra product fields to include (e.g., ["waterproofing", "insulation"])
 
         Returns:
             Dictionary with success, query, total_results, products list
         """
         try:
-            search = _get_search_engine()
-            results = search.search_semantic(query, n_results=min(max_results, 50))
-
-            if min_similarity > 0:
-                results = [p for p in results if p.get('similarity_score', 0) >= min_similarity]
+            # Normalized so rephrasings differing only in case or spacing
+            # share one entry in the engine's result cache
+            results = await search.search_semantic_async(
+                _normalize_query(query),
+                n_results=min(max_results, 50),
+                min_similarity=min_similarity
+            )
 
             return {
                 "success": True,
                 "query": query,
                 "total_results": len(results),
-                "products": results
+                "products": _project(results, fields)
             }
         except Exception as e:
             return {
@@ -129,7 +311,7 @@ async def create_product_search_agent():
                 "error": str(e)
             }
 
-    def filter_products_by_attributes(
+    async def filter_products_by_attributes(
         brand: Optional[str] = None,
         category: Optional[str] = None,
         subcategory: Optional[str] = None,
@@ -140,7 +322,8 @@ async def create_product_search_agent():
         min_rating: Optional[float] = None,
         waterproofing: Optional[str] = None,
         insulation: Optional[str] = None,
-        max_results: int = 10
+        max_results: int = 10,
+        fields: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """
         Filter products by specific attributes (exact match).
@@ -157,55 +340,32 @@ async def create_product_search_agent():
             waterproofing: Filter by waterproofing level
             insulation: Filter by insulation type
             max_results: Maximum products to return (default: 10)
+            fields: Extra product fields to include (e.g., ["waterproofing", "insulation"])
 
         Returns:
             Dictionary with success, filters_applied, total_results, products
         """
+        filters_applied = {
+            "brand": brand, "category": category, "subcategory": subcategory,
+            "gender": gender, "season": season, "min_price": min_price,
+            "max_price": max_price, "min_rating": min_rating,
+            "waterproofing": waterproofing, "insulation": insulation
+        }
         try:
-            search = _get_search_engine()
-            filter_conditions = []
-
-            if brand:
-                filter_conditions.append({"brand": {"$eq": brand}})
-            if category:
-                filter_conditions.append({"category": {"$eq": category}})
-            if subcategory:
-                filter_conditions.append({"subcategory": {"$eq": subcategory}})
-            if gender:
-                filter_conditions.append({"gender": {"$eq": gender}})
-            if season:
-                filter_conditions.append({"season": {"$eq": season}})
-            if waterproofing:
-                filter_conditions.append({"waterproofing": {"$eq": waterproofing}})
-            if insulation:
-                filter_conditions.append({"insulation": {"$eq": insulation}})
-            if min_price is not None:
-                filter_conditions.append({"price_usd": {"$gte": min_price}})
-            if max_price is not None:
-                filter_conditions.append({"price_usd": {"$lte": max_price}})
-            if min_rating is not None:
-                filter_conditions.append({"rating": {"$gte": min_rating}})
-
-            if not filter_conditions:
+            filters = _build_filter(**filters_applied)
+            if filters is None:
                 return {"success": False, "total_results": 0, "products": [],
                         "error": "No filters specified."}
 
-            if len(filter_conditions) == 1:
-                filters = filter_conditions[0]
-            else:
-                filters = {"$and": filter_conditions}
-            results = search.search_by_filters(filters, n_results=max_results)
+            results = await run_in_search_pool(
+                search.search_by_filters, filters, n_results=max_results
+            )
 
             return {
                 "success": True,
-                "filters_applied": {
-                    "brand": brand, "category": category, "subcategory": subcategory,
-                    "gender": gender, "season": season, "min_price": min_price,
-                    "max_price": max_price, "min_rating": min_rating,
-                    "waterproofing": waterproofing, "insulation": insulation
-                },
+                "filters_applied": filters_applied,
                 "total_results": len(results),
-                "products": results
+                "products": _project(results, fields)
             }
         except Exception as e:
             return {
@@ -215,14 +375,15 @@ async def create_product_search_agent():
                 "error": str(e)
             }
 
-    def search_with_filters(
+    async def search_with_filters(
         query: str,
         brand: Optional[str] = None,
         category: Optional[str] = None,
         gender: Optional[str] = None,
         min_price: Optional[float] = None,
         max_price: Optional[float] = None,
-        max_results: int = 10
+        max_results: int = 10,
+        fields: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """
         Hybrid search: semantic search with attribute filters.
@@ -237,43 +398,28 @@ async def create_product_search_agent():
             min_price: Minimum price in USD
             max_price: Maximum price in USD
             max_results: Maximum results (default: 10)
+            fields: Extra product fields to include (e.g., ["waterproofing", "insulation"])
 
         Returns:
             Dictionary with results matching both query AND filters
         """
+        filters_applied = {
+            "brand": brand, "category": category, "gender": gender,
+            "min_price": min_price, "max_price": max_price
+        }
         try:
-            search = _get_search_engine()
-            filter_conditions = []
-
-            if brand:
-                filter_conditions.append({"brand": {"$eq": brand}})
-            if category:
-                filter_conditions.append({"category": {"$eq": category}})
-            if gender:
-                filter_conditions.append({"gender": {"$eq": gender}})
-            if min_price is not None:
-                filter_conditions.append({"price_usd": {"$gte": min_price}})
-            if max_price is not None:
-                filter_conditions.append({"price_usd": {"$lte": max_price}})
-
-            filters = None
-            if filter_conditions:
-                if len(filter_conditions) == 1:
-                    filters = filter_conditions[0]
-                else:
-                    filters = {"$and": filter_conditions}
-
-            results = search.hybrid_search(query, filters=filters, n_results=max_results)
+            filters = _build_filter(**filters_applied)
+
+            results = await search.search_semantic_async(
+                _normalize_query(query), n_results=max_results, filters=filters
+            )
 
             return {
                 "success": True,
                 "query": query,
-                "filters_applied": {
-                    "brand": brand, "category": category, "gender": gender,
-                    "min_price": min_price, "max_price": max_price
-                },
+                "filters_applied": filters_applied,
                 "total_results": len(results),
-                "products": results
+                "products": _project(results, fields)
             }
         except Exception as e:
             return {
@@ -284,25 +430,31 @@ async def create_product_search_agent():
                 "error": str(e)
             }
 
-    def find_similar_products(product_id: str, max_results: int = 5) -> Dict[str, Any]:
+    async def find_similar_products(
+        product_id: str,
+        max_results: int = 5,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
         """
         Find products similar to a specific product.
 
         Args:
             product_id: The ID of the reference product (e.g., "PRD-6A6DD909")
             max_results: Number of similar products to return (default: 5)
+            fields: Extra product fields to include (e.g., ["waterproofing", "insulation"])
 
         Returns:
             Dictionary with reference_product_id, total_results, products
         """
         try:
-            search = _get_search_engine()
-            results = search.get_similar_products(product_id, n_results=max_results)
+            results = await run_in_search_pool(
+                search.get_similar_products, product_id, n_results=max_results
+            )
             return {
                 "success": True,
                 "reference_product_id": product_id,
                 "total_results": len(results),
-                "products": results
+                "products": _project(results, fields)
             }
         except Exception as e:
             return {
@@ -313,41 +465,64 @@ async def create_product_search_agent():
                 "error": str(e)
             }
 
-    def get_product_details(product_id: str) -> Dict[str, Any]:
+    async def get_product_details_batch(product_ids: List[str]) -> Dict[str, Any]:
         """
-        Get detailed information about a specific product.
+        Get detailed information about several products in one lookup.
+
+        Prefer this over repeated get_product_details calls when you need
+        more than one product.
 
         Args:
-            product_id: The product ID (e.g., "PRD-6A6DD909")
+            product_ids: Product IDs (e.g., ["PRD-6A6DD909", "PRD-1B2C3D4E"])
 
         Returns:
-            Dictionary with success, product_id, and product details
+            Dictionary with success, products (product_id -> details),
+            and missing (IDs that were not found)
         """
+        unique_ids = list(dict.fromkeys(product_ids))
         try:
-            search = _get_search_engine()
-            result = search.collection.get(ids=[product_id], include=["metadatas"])
-
-            if result['metadatas']:
-                return {
-                    "success": True,
-                    "product_id": product_id,
-                    "product": result['metadatas'][0]
-                }
+            result = await run_in_search_pool(
+                search.collection.get, ids=unique_ids, include=["metadatas"]
+            )
+            products = dict(zip(result['ids'], result['metadatas']))
             return {
-                "success": False,
-                "product_id": product_id,
-                "product": None,
-                "error": f"Product '{product_id}' not found"
+                "success": bool(products),
+                "products": products,
+                "missing": [pid for pid in unique_ids if pid not in products]
             }
         except Exception as e:
             return {
                 "success": False,
-                "product_id": product_id,
-                "product": None,
+                "products": {},
+                "missing": unique_ids,
                 "error": str(e)
             }
 
-    def get_available_brands() -> Dict[str, Any]:
+    async def get_product_details(product_id: str) -> Dict[str, Any]:
+        """
+        Get detailed information about a specific product.
+
+        Args:
+            product_id: The product ID (e.g., "PRD-6A6DD909")
+
+        Returns:
+            Dictionary with success, product_id, and product details
+        """
+        batch = await get_product_details_batch([product_id])
+        if product_id in batch['products']:
+            return {
+                "success": True,
+                "product_id": product_id,
+                "product": batch['products'][product_id]
+            }
+        return {
+            "success": False,
+            "product_id": product_id,
+            "product": None,
+            "error": batch.get('error', f"Product '{product_id}' not found")
+        }
+
+    async def get_available_brands() -> Dict[str, Any]:
         """
         Get list of all available brands in the catalog.
 
@@ -355,14 +530,13 @@ async def create_product_search_agent():
             Dictionary with success, total_brands, brands list
         """
         try:
-            search = _get_search_engine()
-            all_products = search.collection.get(limit=1000)
-            brands = sorted(set(m['brand'] for m in all_products['metadatas']))
+            facets = await run_in_search_pool(search.get_facets)
+            brands = facets['brands']
             return {"success": True, "total_brands": len(brands), "brands": brands}
         except Exception as e:
             return {"success": False, "total_brands": 0, "brands": [], "error": str(e)}
 
-    def get_available_categories() -> Dict[str, Any]:
+    async def get_available_categories() -> Dict[str, Any]:
         """
         Get list of all categories and subcategories.
 
@@ -370,61 +544,25 @@ async def create_product_search_agent():
             Dictionary with success and categories mapping
         """
         try:
-            search = _get_search_engine()
-            all_products = search.collection.get(limit=1000)
-
-            categories = {}
-            for m in all_products['metadatas']:
-                cat = m['category']
-                subcat = m['subcategory']
-                if cat not in categories:
-                    categories[cat] = set()
-                categories[cat].add(subcat)
-
-            categories = {k: sorted(list(v)) for k, v in categories.items()}
-            return {"success": True, "categories": categories}
+            facets = await run_in_search_pool(search.get_facets)
+            return {"success": True, "categories": facets['categories']}
         except Exception as e:
             return {"success": False, "categories": {}, "error": str(e)}
 
     # Create the agent
     agent = chat_client.create_agent(
-        instructions="""You are a product search specialist for an outdoor apparel store.
-
-Your job is to:
-1. Search for products based on user queries (use search_products for semantic search)
-2. Apply filters when user specifies constraints (brand, price, gender, etc.)
-3. Use search_with_filters for combined semantic + filter searches
-4. Find similar products when requested
-5. Provide product details when asked about specific items
-
-SEARCH STRATEGY:
-- For vague queries ("warm jacket") → use search_products
-- For specific constraints ("women's jacket under $200") → use search_with_filters
-- For browsing ("show me NorthPeak products") → use filter_products_by_attributes
-- For alternatives ("something like this one") → use find_similar_products
-
-CRITICAL - OUTPUT FORMAT:
-- Return the RAW JSON output from search tools directly
-- Do NOT format results as markdown, tables, or bullet points
-- Do NOT add commentary or descriptions around the JSON
-- Just return the tool's JSON output as-is
-- The Advisor agent will handle all formatting and visualization
-
-Example response (just return this, nothing else):
-{"success": true, "total_results": 5, "products": [...]}
-
-IMPORTANT:
-- You will receive user context (preferences, sizing, budget) from the Advisor
-- Apply this context to your searches using filters
-- Focus ONLY on search tasks - don't handle personalization""",
+        instructions=_AGENT_INSTRUCTIONS,
         tools=[
-            search_products,
-            filter_products_by_attributes,
-            search_with_filters,
-            find_similar_products,
-            get_product_details,
-            get_available_brands,
-            get_available_categories,
+            _json_tool(tool) for tool in (
+                search_products,
+                filter_products_by_attributes,
+                search_with_filters,
+                find_similar_products,
+                get_product_details,
+                get_product_details_batch,
+                get_available_brands,
+                get_available_categories,
+            )
         ]
     )
 
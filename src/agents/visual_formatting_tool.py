@@ -10,13 +10,93 @@ Handles:
 All output is markdown-compatible for Gradio display.
 """
 
+import math
 from typing import Any, Dict, List, Optional
 
+import numpy as np
+
+
+# Star strings for every half-step rating from 0.0 to 5.0, indexed by
+# int(rating * 2)
+_STAR_STRINGS = tuple("⭐" * (i // 2) + ("½" if i % 2 else "") for i in range(11))
+
+
+def _star_rating(rating: float) -> str:
+    """Render a rating as stars, e.g. 4.7 -> "⭐⭐⭐⭐½"."""
+    if isinstance(rating, (int, float)) and 0 <= rating <= 5:
+        return _STAR_STRINGS[int(rating * 2)]
+    return "⭐" * int(rating) + ("½" if rating % 1 >= 0.5 else "")
+
+
+def _truncate(text: str, max_len: int) -> str:
+    """Shorten text to at most max_len characters, ending in "..." if cut."""
+    return text if len(text) <= max_len else text[:max_len - 3] + "..."
+
+
+# Default feature checks for create_feature_matrix
+_DEFAULT_FEATURE_CHECKS = {
+    "Waterproof": lambda p: "waterproof" in str(p.get('waterproofing', '')).lower(),
+    "Down Insulation": lambda p: "down" in str(p.get('insulation', '')).lower(),
+    "High Rating (4.5+)": lambda p: p.get('rating', 0) >= 4.5,
+    "Under $300": lambda p: p.get('price_usd', math.inf) < 300,
+    "Winter Ready": lambda p: p.get('season', '') == 'Winter',
+    "Recycled Material": lambda p: "recycled" in str(p.get('material', '')).lower(),
+}
+
 
 # ============================================================================
 # VISUALIZATION TOOLS
 # ============================================================================
 
+def _render_product_card(product_data: Dict[str, Any]) -> str:
+    """Render the markdown for a product card (see create_product_card)."""
+    # Extract product details
+    name = product_data.get('product_name', 'Unknown Product')
+    brand = product_data.get('brand', 'Unknown')
+    price = product_data.get('price_usd', 0.0)
+    rating = product_data.get('rating', 0.0)
+    category = product_data.get('category', 'Unknown')
+    subcategory = product_data.get('subcategory', '')
+    gender = product_data.get('gender', '')
+    season = product_data.get('season', '')
+    waterproofing = product_data.get('waterproofing', '')
+    insulation = product_data.get('insulation', '')
+    material = product_data.get('material', '')
+    color = product_data.get('color', '')
+    primary_purpose = product_data.get('primary_purpose', '')
+
+    # Rating and price
+    stars = _star_rating(rating)
+    category_line = f"{category} > {subcategory}" if subcategory else category
+
+    # Optional sections, each ending with its own blank line
+    info = " | ".join(filter(None, (
+        f"**Gender:** {gender}" if gender else "",
+        f"**Season:** {season}" if season else "",
+    )))
+    info_block = f"{info}\n\n" if info else ""
+
+    features = "\n".join(filter(None, (
+        f"- Waterproofing: {waterproofing}" if waterproofing else "",
+        f"- Insulation: {insulation}" if insulation else "",
+        f"- Material: {material}" if material else "",
+        f"- Color: {color}" if color else "",
+    )))
+    features_block = f"**Features:**\n{features}\n\n" if features else ""
+
+    purpose_block = f"**Best For:** {primary_purpose}\n" if primary_purpose else ""
+
+    # Build markdown card
+    card_str = (
+        f"### {name}\n"
+        f"**{brand}** | {category_line}\n\n"
+        f"**Rating:** {rating}/5.0 {stars}\n"
+        f"**Price:** ${price:.2f}\n\n"
+        f"{info_block}{features_block}{purpose_block}---"
+    )
+    return card_str
+
+
 def create_product_card(product_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Create a styled markdown product card for a single product.
@@ -28,66 +108,7 @@ def create_product_card(product_data: Dict[str, Any]) -> Dict[str, Any]:
         Dictionary with markdown card string and metadata
     """
     try:
-        # Extract product details
-        name = product_data.get('product_name', 'Unknown Product')
-        brand = product_data.get('brand', 'Unknown')
-        price = product_data.get('price_usd', 0.0)
-        rating = product_data.get('rating', 0.0)
-        category = product_data.get('category', 'Unknown')
-        subcategory = product_data.get('subcategory', '')
-        gender = product_data.get('gender', '')
-        season = product_data.get('season', '')
-        waterproofing = product_data.get('waterproofing', '')
-        insulation = product_data.get('insulation', '')
-        material = product_data.get('material', '')
-        color = product_data.get('color', '')
-        primary_purpose = product_data.get('primary_purpose', '')
-
-        # Build markdown card
-        lines = []
-        lines.append(f"### {name}")
-        lines.append(f"**{brand}** | {category}" + (f" > {subcategory}" if subcategory else ""))
-        lines.append("")
-
-        # Rating and price
-        stars = "⭐" * int(rating) + ("½" if rating % 1 >= 0.5 else "")
-        lines.append(f"**Rating:** {rating}/5.0 {stars}")
-        lines.append(f"**Price:** ${price:.2f}")
-        lines.append("")
-
-        # Basic info
-        info_parts = []
-        if gender:
-            info_parts.append(f"**Gender:** {gender}")
-        if season:
-            info_parts.append(f"**Season:** {season}")
-        if info_parts:
-            lines.append(" | ".join(info_parts))
-            lines.append("")
-
-        # Features
-        features = []
-        if waterproofing:
-            features.append(f"- Waterproofing: {waterproofing}")
-        if insulation:
-            features.append(f"- Insulation: {insulation}")
-        if material:
-            features.append(f"- Material: {material}")
-        if color:
-            features.append(f"- Color: {color}")
-
-        if features:
-            lines.append("**Features:**")
-            lines.extend(features)
-            lines.append("")
-
-        # Purpose
-        if primary_purpose:
-            lines.append(f"**Best For:** {primary_purpose}")
-
-        lines.append("---")
-
-        card_str = "\n".join(lines)
+        card_str = _render_product_card(product_data)
 
         return {
             "success": True,
@@ -95,9 +116,9 @@ def create_product_card(product_data: Dict[str, Any]) -> Dict[str, Any]:
             "content": card_str,
             "metadata": {
                 "product_id": product_data.get('product_id'),
-                "product_name": name,
-                "price": price,
-                "rating": rating
+                "product_name": product_data.get('product_name', 'Unknown Product'),
+                "price": product_data.get('price_usd', 0.0),
+                "rating": product_data.get('rating', 0.0)
             }
         }
 
@@ -110,6 +131,22 @@ def create_product_card(product_data: Dict[str, Any]) -> Dict[str, Any]:
         }
 
 
+def _format_comparison_cell(attr: str, value: Any) -> str:
+    """Format one comparison table value ("-" when missing or unusable)."""
+    if value == '' or value is None:
+        return "-"
+    if attr == 'price_usd':
+        return f"${value:.2f}" if isinstance(value, (int, float)) else "-"
+    if attr == 'rating':
+        return f"{value:.1f}" if isinstance(value, (int, float)) else "-"
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    if isinstance(value, bool):
+        return "✓" if value else "✗"
+    # Truncate long values
+    return _truncate(str(value), 15)
+
+
 def create_comparison_table(
     products: List[Dict[str, Any]],
     attributes: Optional[List[str]] = None
@@ -151,53 +188,27 @@ def create_comparison_table(
         # Build markdown table
         lines = []
 
-        # Header row
-        header = "| Attribute |"
-        for prod in products:
-            name = prod.get('product_name', 'Unknown')
-            # Truncate long names
-            if len(name) > 20:
-                name = name[:17] + "..."
-            header += f" {name} |"
-        lines.append(header)
+        # Header row (long names truncated)
+        names = [_truncate(prod.get('product_name', 'Unknown'), 20) for prod in products]
+        lines.append("| Attribute | " + " | ".join(names) + " |")
 
         # Separator row
-        separator = "|-----------|"
-        for _ in range(num_products):
-            separator += "------------|"
-        lines.append(separator)
+        lines.append("|-----------|" + "------------|" * num_products)
+
+        # Pull every value once: one row of values per attribute
+        grid = [[prod.get(attr, '') for prod in products] for attr in attributes]
 
         # Data rows
-        for attr in attributes:
-            row = f"| **{attr.replace('_', ' ').title()}** |"
-
-            for idx, prod in enumerate(products):
-                value = prod.get(attr, '')
-
-                # Format value
-                if value == '' or value is None:
-                    formatted = "-"
-                elif attr == 'price_usd':
-                    formatted = f"${value:.2f}" if isinstance(value, (int, float)) else "-"
-                    if idx == best_price_idx and formatted != "-":
-                        formatted += " 💰"
-                elif attr == 'rating':
-                    formatted = f"{value:.1f}" if isinstance(value, (int, float)) else "-"
-                    if idx == best_rating_idx and formatted != "-":
-                        formatted += " ⭐"
-                elif isinstance(value, float):
-                    formatted = f"{value:.2f}"
-                elif isinstance(value, bool):
-                    formatted = "✓" if value else "✗"
-                else:
-                    formatted = str(value)
-                    # Truncate long values
-                    if len(formatted) > 15:
-                        formatted = formatted[:12] + "..."
-
-                row += f" {formatted} |"
-
-            lines.append(row)
+        for attr, values in zip(attributes, grid):
+            cells = [_format_comparison_cell(attr, value) for value in values]
+
+            # Highlight the best price / rating
+            if attr == 'price_usd' and cells[best_price_idx] != "-":
+                cells[best_price_idx] += " 💰"
+            elif attr == 'rating' and cells[best_rating_idx] != "-":
+                cells[best_rating_idx] += " ⭐"
+
+            lines.append(f"| **{attr.replace('_', ' ').title()}** | " + " | ".join(cells) + " |")
 
         # Legend
         lines.append("")
@@ -261,14 +272,7 @@ def create_feature_matrix(
 
         # Define feature checks
         if not features:
-            feature_checks = {
-                "Waterproof": lambda p: "waterproof" in str(p.get('waterproofing', '')).lower(),
-                "Down Insulation": lambda p: "down" in str(p.get('insulation', '')).lower(),
-                "High Rating (4.5+)": lambda p: p.get('rating', 0) >= 4.5,
-                "Under $300": lambda p: p.get('price_usd', float('inf')) < 300,
-                "Winter Ready": lambda p: p.get('season', '') == 'Winter',
-                "Recycled Material": lambda p: "recycled" in str(p.get('material', '')).lower(),
-            }
+            feature_checks = _DEFAULT_FEATURE_CHECKS
         else:
             # Custom features - check if attribute exists and is truthy
             feature_checks = {feat: lambda p, f=feat: bool(p.get(f)) for feat in features}
@@ -278,43 +282,37 @@ def create_feature_matrix(
         lines.append("### Feature Comparison")
         lines.append("")
 
-        # Header row with product names
-        header = "| Feature |"
-        for prod in products:
-            name = prod.get('product_name', 'Unknown')
-            # Use short name
-            short_name = name[:12] + "..." if len(name) > 15 else name
-            header += f" {short_name} |"
-        lines.append(header)
+        # Header row with short product names
+        short_names = [_truncate(prod.get('product_name', 'Unknown'), 15) for prod in products]
+        lines.append("| Feature | " + " | ".join(short_names) + " |")
 
         # Separator
-        separator = "|---------|"
-        for _ in range(num_products):
-            separator += "------------|"
-        lines.append(separator)
+        lines.append("|---------|" + "------------|" * num_products)
+
+        # Evaluate every (feature, product) cell into a boolean matrix
+        results = np.array(
+            [[bool(check_func(prod)) for prod in products] for check_func in feature_checks.values()],
+            dtype=bool
+        ).reshape(len(feature_checks), num_products)
 
         # Feature rows
-        feature_scores = [0] * num_products
-        for feature_name, check_func in feature_checks.items():
-            row = f"| {feature_name} |"
-            for idx, prod in enumerate(products):
-                has_feature = check_func(prod)
-                row += " ✅ |" if has_feature else " ❌ |"
-                if has_feature:
-                    feature_scores[idx] += 1
-            lines.append(row)
+        for feature_name, row in zip(feature_checks, results.tolist()):
+            marks = ["✅" if has_feature else "❌" for has_feature in row]
+            lines.append(f"| {feature_name} | " + " | ".join(marks) + " |")
 
         # Score row
+        feature_scores = results.sum(axis=0)
         max_features = len(feature_checks)
-        score_row = "| **Score** |"
-        for score in feature_scores:
-            score_row += f" **{score}/{max_features}** |"
-        lines.append(score_row)
+        lines.append(
+            "| **Score** | "
+            + " | ".join(f"**{score}/{max_features}**" for score in feature_scores.tolist())
+            + " |"
+        )
 
         # Best matches summary
         lines.append("")
-        max_score = max(feature_scores) if feature_scores else 0
-        best_indices = [i for i, s in enumerate(feature_scores) if s == max_score]
+        max_score = int(feature_scores.max())
+        best_indices = np.flatnonzero(feature_scores == max_score).tolist()
         best_products = [products[i].get('product_name', 'Unknown') for i in best_indices]
 
         best_names = ', '.join(best_products)
@@ -377,24 +375,24 @@ def create_price_visualization(
                 "error": "No valid prices found"
             }
 
-        # Calculate statistics
-        min_price = min(prices)
-        max_price = max(prices)
-        avg_price = sum(prices) / len(prices)
-        sorted_prices = sorted(prices)
-        median_price = sorted_prices[len(sorted_prices) // 2]
-
-        # Find best value (highest rating / price ratio)
-        best_value_idx = 0
-        best_value_score = 0
-        for idx, prod in enumerate(products):
-            price = prod.get('price_usd', 0)
-            rating = prod.get('rating', 0)
-            if price > 0:
-                value_score = rating / price * 100
-                if value_score > best_value_score:
-                    best_value_score = value_score
-                    best_value_idx = idx
+        # Calculate statistics in one pass over a contiguous array; min/max/
+        # median index back into prices so they keep their original types
+        prices_arr = np.asarray(prices, dtype=np.float64)
+        min_price = prices[prices_arr.argmin()]
+        max_price = prices[prices_arr.argmax()]
+        avg_price = float(prices_arr.mean())
+        # Upper median (no averaging), via O(n) selection instead of a full sort
+        mid = len(prices) // 2
+        median_price = prices[np.argpartition(prices_arr, mid)[mid]]
+
+        # Find best value (highest rating / price ratio); unpriced products
+        # score 0, and the first product wins if nothing scores above 0
+        all_prices = np.array([p.get('price_usd', 0) for p in products], dtype=np.float64)
+        ratings = np.array([p.get('rating', 0) for p in products], dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            value_scores = np.where(all_prices > 0, ratings / all_prices * 100, 0.0)
+        value_scores = np.nan_to_num(value_scores, nan=0.0)
+        best_value_idx = int(value_scores.argmax()) if value_scores.max() > 0 else 0
 
         best_value_product = products[best_value_idx]
 
@@ -425,29 +423,27 @@ def create_price_visualization(
             lines.append("**Price Distribution:**")
             lines.append("")
 
-            # Create buckets
+            # Create buckets: occupied bucket indices (sorted) and their counts
             bucket_size = 100
-            buckets = {}
-
-            for price in prices:
-                bucket = int(price // bucket_size) * bucket_size
-                buckets[bucket] = buckets.get(bucket, 0) + 1
+            bucket_ids, bucket_counts = np.unique(
+                (prices_arr // bucket_size).astype(np.int64), return_counts=True
+            )
 
-            # Find max count for bar scaling
-            max_count = max(buckets.values()) if buckets else 1
+            # Range starts and bar lengths (scaled to the fullest bucket) for
+            # all buckets at once
+            bucket_starts = bucket_ids * bucket_size
+            bar_lengths = (bucket_counts / bucket_counts.max() * 10).astype(np.int64)
 
             # Display distribution
             lines.append("| Price Range | Count | |")
             lines.append("|-------------|-------|---|")
-
-            for bucket_start in sorted(buckets.keys()):
-                count = buckets[bucket_start]
-                bar_length = int((count / max_count) * 10)
-                bar_chart = "█" * bar_length
-                lines.append(
-                    f"| ${bucket_start}-${bucket_start + bucket_size} "
-                    f"| {count} | {bar_chart} |"
+            lines.extend(
+                f"| ${bucket_start}-${bucket_start + bucket_size} "
+                f"| {count} | {'█' * bar_length} |"
+                for bucket_start, count, bar_length in zip(
+                    bucket_starts.tolist(), bucket_counts.tolist(), bar_lengths.tolist()
                 )
+            )
 
         viz_str = "\n".join(lines)
 
@@ -473,6 +469,38 @@ def create_price_visualization(
         }
 
 
+def _render_product_list(products: List[Dict[str, Any]], show_details: bool = True) -> str:
+    """Render the markdown for a non-empty product list (see format_product_list)."""
+    # Limit to 10, extracting each column once
+    shown = products[:10]
+    names = [prod.get('product_name', 'Unknown') for prod in shown]
+    prices = [prod.get('price_usd', 0) for prod in shown]
+
+    if show_details:
+        # Detailed table format
+        names = [_truncate(name, 25) for name in names]
+        brands = [prod.get('brand', '-') for prod in shown]
+        ratings = [prod.get('rating', 0) for prod in shown]
+
+        lines = ["| Product | Brand | Price | Rating |", "|---------|-------|-------|--------|"]
+        lines.extend(
+            f"| {name} | {brand} | ${price:.2f} | {rating:.1f}⭐ |"
+            for name, brand, price, rating in zip(names, brands, prices, ratings)
+        )
+    else:
+        # Simple list format
+        lines = [
+            f"{idx}. **{name}** - ${price:.2f}"
+            for idx, (name, price) in enumerate(zip(names, prices), 1)
+        ]
+
+    if len(products) > 10:
+        lines.append("")
+        lines.append(f"*...and {len(products) - 10} more products*")
+
+    return "\n".join(lines)
+
+
 def format_product_list(
     products: List[Dict[str, Any]],
     show_details: bool = True
@@ -496,34 +524,7 @@ def format_product_list(
                 "error": None
             }
 
-        lines = []
-
-        if show_details:
-            # Detailed table format
-            lines.append("| Product | Brand | Price | Rating |")
-            lines.append("|---------|-------|-------|--------|")
-
-            for prod in products[:10]:  # Limit to 10
-                name = prod.get('product_name', 'Unknown')
-                if len(name) > 25:
-                    name = name[:22] + "..."
-                brand = prod.get('brand', '-')
-                price = prod.get('price_usd', 0)
-                rating = prod.get('rating', 0)
-
-                lines.append(f"| {name} | {brand} | ${price:.2f} | {rating:.1f}⭐ |")
-        else:
-            # Simple list format
-            for idx, prod in enumerate(products[:10], 1):
-                name = prod.get('product_name', 'Unknown')
-                price = prod.get('price_usd', 0)
-                lines.append(f"{idx}. **{name}** - ${price:.2f}")
-
-        if len(products) > 10:
-            lines.append("")
-            lines.append(f"*...and {len(products) - 10} more products*")
-
-        list_str = "\n".join(lines)
+        list_str = _render_product_list(products, show_details)
 
         return {
             "success": True,
@@ -615,10 +616,12 @@ class VisualFormattingTool:
 
         num_products = len(products)
 
-        # Single product - show detailed card
+        # Single product - show detailed card (content only, no result dict)
         if num_products == 1:
-            result = self.create_product_card(products[0])
-            return result.get('content', '')
+            try:
+                return _render_product_card(products[0])
+            except Exception:
+                return ""
 
         # 2-5 products - comparison table
         if 2 <= num_products <= 5 or intent == "comparison":
@@ -627,21 +630,35 @@ class VisualFormattingTool:
 
         # Many products - show list with price analysis
         if num_products > 5:
-            list_result = self.format_product_list(products)
+            try:
+                list_content = _render_product_list(products)
+            except Exception:
+                list_content = ""
             price_result = self.create_price_visualization(products, show_distribution=False)
 
-            return f"{list_result.get('content', '')}\n\n{price_result.get('content', '')}"
+            return f"{list_content}\n\n{price_result.get('content', '')}"
 
         # Default - simple list
         result = self.format_product_list(products)
         return result.get('content', '')
 
 
+# Shared instance for the convenience functions (the tool is stateless)
+_visual_formatting_tool = None
+
+
+def _get_visual_formatting_tool() -> VisualFormattingTool:
+    """Get or create the shared VisualFormattingTool instance."""
+    global _visual_formatting_tool
+    if _visual_formatting_tool is None:
+        _visual_formatting_tool = VisualFormattingTool()
+    return _visual_formatting_tool
+
+
 # Convenience functions for direct use
 def visualize_products(products: List[Dict[str, Any]], intent: str = "search") -> str:
     """Convenience function to auto-visualize products."""
-    tool = VisualFormattingTool()
-    return tool.auto_visualize(products, intent)
+    return _get_visual_formatting_tool().auto_visualize(products, intent)
 
 
 # Backward compatibility alias
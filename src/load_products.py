@@ -1,86 +1,220 @@
 """
 Load outdoor products into ChromaDB for vector search and recommendations.
 """
+import hashlib
+import json
+import os
 from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# Products embedded per collection.add call during ingest
+DEFAULT_BATCH_SIZE = 64
+
+# Same model as Chroma's default embedding function (which embeds queries),
+# used when ingest embeddings are computed explicitly on a device
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# CSV columns stored as string metadata, keyed by metadata field
+STRING_METADATA_COLUMNS = {
+    "product_id": "ProductID",
+    "brand": "Brand",
+    "category": "Category",
+    "subcategory": "Subcategory",
+    "product_line": "ProductLine",
+    "product_name": "ProductName",
+    "gender": "Gender",
+    "material": "Material",
+    "season": "Season",
+    "color": "Color",
+    "primary_purpose": "PrimaryPurpose",
+    "weather_profile": "WeatherProfile",
+    "terrain": "Terrain",
+    "waterproofing": "Waterproofing",
+    "insulation": "Insulation",
+}
+
+
+# Columns read from the products CSV (the rest are skipped) and their types.
+# PriceUSD is left to pandas' inference so whole-dollar prices still render
+# as "$199" in the embedded document text.
+CSV_DTYPES = {
+    **{column: str for column in STRING_METADATA_COLUMNS.values()},
+    "Description": str,
+    "Rating": "float64",
+}
+CSV_COLUMNS = [*CSV_DTYPES, "PriceUSD"]
+
+
+def _build_records(df: "pd.DataFrame"):
+    """
+    Build ChromaDB documents, metadatas and ids from the products DataFrame.
+
+    Each column is materialized once as a Python list and the rows are
+    assembled with zip, instead of constructing a Series per row with
+    iterrows().
+    """
+    # str() each value so missing cells become "nan", as before
+    text = {
+        field: [str(value) for value in df[column].tolist()]
+        for field, column in STRING_METADATA_COLUMNS.items()
+    }
+    descriptions = df["Description"].tolist()
+    raw_prices = df["PriceUSD"].tolist()
+    prices = [float(price) for price in raw_prices]
+    ratings = [float(rating) for rating in df["Rating"].tolist()]
+
+    fields = list(text)
+    documents = []
+    metadatas = []
+    for values, description, raw_price, price, rating in zip(
+        zip(*text.values()), descriptions, raw_prices, prices, ratings
+    ):
+        metadata = dict(zip(fields, values))
+
+        # Create rich text for embedding (semantic search). Built directly
+        # rather than as a stripped triple-quoted string; the line indent is
+        # kept so documents match the ones already embedded.
+        document = (
+            f"{metadata['product_name']}\n"
+            f"        Brand: {metadata['brand']}\n"
+            f"        Category: {metadata['category']} - {metadata['subcategory']}\n"
+            f"        Description: {description}\n"
+            f"        Gender: {metadata['gender']}\n"
+            f"        Material: {metadata['material']}\n"
+            f"        Season: {metadata['season']}\n"
+            f"        Purpose: {metadata['primary_purpose']}\n"
+            f"        Weather: {metadata['weather_profile']}\n"
+            f"        Terrain: {metadata['terrain']}\n"
+            f"        Features: Waterproofing={metadata['waterproofing']}, "
+            f"Insulation={metadata['insulation']}\n"
+            f"        Price: ${raw_price}\n"
+            f"        Color: {metadata['color']}"
+        )
+
+        # Metadata for filtering (keyword search)
+        metadata["price_usd"] = price
+        metadata["rating"] = rating
+
+        documents.append(document)
+        metadatas.append(metadata)
+
+    return documents, metadatas, text["product_id"]
+
+
+def _encode_documents(documents: List[str], device: str, batch_size: int):
+    """
+    Embed documents with sentence-transformers on the given device.
+
+    Runs the model in batched forward passes (on GPU when device="cuda")
+    instead of Chroma's default single-threaded ONNX path.
+    """
+    from sentence_transformers import SentenceTransformer
 
-import chromadb
-import pandas as pd
+    model = SentenceTransformer(EMBEDDING_MODEL, device=device)
+    return model.encode(
+        documents,
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    )
 
 
-def load_products_to_chromadb():
-    """Load products from CSV into ChromaDB collection."""
+def _catalog_version(documents: List[str], metadatas: List[dict], ids: List[str]) -> str:
+    """Fingerprint the loaded records, so any change to the catalog changes it."""
+    payload = json.dumps([ids, documents, metadatas], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def load_products_to_chromadb(
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    device: Optional[str] = None,
+    ef_search: Optional[int] = None
+):
+    """
+    Load products from CSV into ChromaDB collection.
+
+    Args:
+        batch_size: Products embedded and added per collection.add call
+        device: If set (e.g. "cuda", "cpu"), compute embeddings up front with
+            sentence-transformers on this device; otherwise Chroma embeds
+            each batch with its default embedding function
+        ef_search: Optional HNSW search breadth (higher = better recall,
+            slower). Stored with the collection when it is created, so it
+            applies to every client of the database; an existing collection
+            keeps its value
+    """
+    # Imported here so importing this module (e.g. for _build_records) doesn't
+    # pay for loading Chroma's native libraries and pandas
+    import chromadb
+    import pandas as pd
+
+    try:
+        from src.product_search import (
+            CATALOG_VERSION_KEY,
+            COLLECTION_CONFIGURATION,
+            COLLECTION_NAME,
+            invalidate_catalog
+        )
+    except ImportError:
+        # Run as a script (python src/load_products.py), with src/ on sys.path
+        from product_search import (
+            CATALOG_VERSION_KEY,
+            COLLECTION_CONFIGURATION,
+            COLLECTION_NAME,
+            invalidate_catalog
+        )
 
     # Initialize ChromaDB client (persistent storage)
     client = chromadb.PersistentClient(path="./chroma_db")
 
     # Create or get collection
     # ChromaDB will use default embedding function (all-MiniLM-L6-v2)
+    # Same index settings as ProductSearch creates the collection with
+    configuration = COLLECTION_CONFIGURATION
+    if ef_search is not None:
+        configuration = {"hnsw": {**configuration["hnsw"], "ef_search": ef_search}}
     collection = client.get_or_create_collection(
-        name="outdoor_products",
-        metadata={"description": "Outdoor apparel and gear products"}
+        name=COLLECTION_NAME,
+        metadata={"description": "Outdoor apparel and gear products"},
+        configuration=configuration
     )
 
     # Load products from CSV
     csv_path = Path("data/outdoor_products_300_with_lines.csv")
-    df = pd.read_csv(csv_path)
+    df = pd.read_csv(csv_path, usecols=CSV_COLUMNS, dtype=CSV_DTYPES)
 
     print(f"Loading {len(df)} products into ChromaDB...")
 
-    # Prepare data for ChromaDB
-    documents = []
-    metadatas = []
-    ids = []
-
-    for _, row in df.iterrows():
-        # Create rich text for embedding (semantic search)
-        document = f"""
-        {row['ProductName']}
-        Brand: {row['Brand']}
-        Category: {row['Category']} - {row['Subcategory']}
-        Description: {row['Description']}
-        Gender: {row['Gender']}
-        Material: {row['Material']}
-        Season: {row['Season']}
-        Purpose: {row['PrimaryPurpose']}
-        Weather: {row['WeatherProfile']}
-        Terrain: {row['Terrain']}
-        Features: Waterproofing={row['Waterproofing']}, Insulation={row['Insulation']}
-        Price: ${row['PriceUSD']}
-        Color: {row['Color']}
-        """.strip()
+    documents, metadatas, ids = _build_records(df)
 
-        # Metadata for filtering (keyword search)
-        metadata = {
-            "product_id": str(row['ProductID']),
-            "brand": str(row['Brand']),
-            "category": str(row['Category']),
-            "subcategory": str(row['Subcategory']),
-            "product_line": str(row['ProductLine']),
-            "product_name": str(row['ProductName']),
-            "gender": str(row['Gender']),
-            "material": str(row['Material']),
-            "season": str(row['Season']),
-            "color": str(row['Color']),
-            "primary_purpose": str(row['PrimaryPurpose']),
-            "weather_profile": str(row['WeatherProfile']),
-            "terrain": str(row['Terrain']),
-            "waterproofing": str(row['Waterproofing']),
-            "insulation": str(row['Insulation']),
-            "price_usd": float(row['PriceUSD']),
-            "rating": float(row['Rating']),
-        }
+    embeddings = _encode_documents(documents, device, batch_size) if device else None
 
-        documents.append(document)
-        metadatas.append(metadata)
-        ids.append(str(row['ProductID']))
-
-    # Add to ChromaDB collection
-    # ChromaDB automatically generates embeddings
-    collection.add(
-        documents=documents,
-        metadatas=metadatas,
-        ids=ids
-    )
+    # Add to ChromaDB collection in batches so only one batch of embeddings
+    # is held in memory at a time
+    # Without precomputed embeddings, ChromaDB generates them automatically
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        batch = {
+            "documents": documents[start:end],
+            "metadatas": metadatas[start:end],
+            "ids": ids[start:end],
+        }
+        if embeddings is not None:
+            batch["embeddings"] = embeddings[start:end]
+        collection.add(**batch)
+
+    # Tag the collection with the catalog it now holds, so facet indexes
+    # built from an older catalog are rebuilt (in this and other processes)
+    collection.modify(metadata={
+        **(collection.metadata or {}),
+        CATALOG_VERSION_KEY: _catalog_version(documents, metadatas, ids)
+    })
+    invalidate_catalog()
 
     print(f"✓ Successfully loaded {len(df)} products")
     print(f"✓ Collection size: {collection.count()}")
@@ -89,17 +223,24 @@ def load_products_to_chromadb():
 
 
 if __name__ == "__main__":
-    collection = load_products_to_chromadb()
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    collection = load_products_to_chromadb(
+        device=os.getenv("EMBED_DEVICE") or None,
+        ef_search=int(os.getenv("CHROMA_EF_SEARCH", "0")) or None
+    )
 
     # Test query
     print("\n--- Testing search ---")
     results = collection.query(
         query_texts=["waterproof jacket for hiking"],
-        n_results=3
+        n_results=3,
+        include=["metadatas"]
     )
 
     print("\nTop 3 results for 'waterproof jacket for hiking':")
-    for i, (doc, metadata) in enumerate(zip(results['documents'][0], results['metadatas'][0]), 1):
+    for i, metadata in enumerate(results['metadatas'][0], 1):
         print(f"\n{i}. {metadata['product_name']}")
         print(f"   Brand: {metadata['brand']}")
         print(f"   Category: {metadata['subcategory']}")
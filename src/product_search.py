@@ -1,27 +1,213 @@
 """
 Product search system using ChromaDB hybrid search.
 """
-from typing import Any, Dict, List, Optional
+import asyncio
+import functools
+import json
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
 
 import chromadb
+import numpy as np
+from chromadb.utils import embedding_functions
+
+# Sidecar file (inside the ChromaDB directory) holding the catalog facet index
+FACETS_FILENAME = "facets.json"
+
+COLLECTION_NAME = "outdoor_products"
+
+# Collection metadata key holding a fingerprint of the loaded catalog
+# (written by load_products); the facet sidecar is only trusted when it
+# was built from the same catalog version
+CATALOG_VERSION_KEY = "catalog_version"
+
+# Index settings applied when the collection is first created (ignored for an
+# existing collection). max_neighbors is HNSW's M; a wider ef_construction
+# builds a better graph once so searches get good recall at the default
+# ef_search.
+COLLECTION_CONFIGURATION = {"hnsw": {"max_neighbors": 16, "ef_construction": 200}}
+
+# Query result fields the formatters read; documents and embeddings are never
+# used, so they are not fetched
+QUERY_INCLUDE = ["metadatas", "distances"]
+
+# Number of simple-dict filters kept translated into ChromaDB where clauses
+WHERE_CACHE_SIZE = 128
+
+# Worker threads for ChromaDB calls made from async code
+SEARCH_POOL_WORKERS = 8
+
+# One PersistentClient per database directory, shared by every ProductSearch in
+# the process (the agent, agent_tools and search_tools each keep an engine)
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
+
+# Live engines and other caches of product data, dropped by invalidate_catalog()
+_engines: "weakref.WeakSet[ProductSearch]" = weakref.WeakSet()
+_catalog_cache_clearers: List[Callable[[], None]] = []
+
+
+def register_catalog_cache(clear: Callable[[], None]) -> Callable[[], None]:
+    """Have invalidate_catalog() call clear (usable as a decorator)."""
+    _catalog_cache_clearers.append(clear)
+    return clear
+
+
+def invalidate_catalog() -> None:
+    """
+    Drop everything this process derived from the product collection.
+
+    Call after rewriting the collection (load_products does). Every live
+    ProductSearch rebuilds its facet index and drops cached results, and
+    registered caches are cleared. Other processes see the new catalog
+    version the next time they load the facet index.
+    """
+    for engine in list(_engines):
+        engine.refresh_facets()
+    for clear in _catalog_cache_clearers:
+        clear()
+
+
+def _get_client(db_path: str):
+    """Get or create the process-wide PersistentClient for a database directory."""
+    key = str(Path(db_path).resolve())
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = chromadb.PersistentClient(path=db_path)
+    return client
+
+
+@dataclass(slots=True, frozen=True)
+class _PackedProducts:
+    """
+    Compact copy of a product list, as held by the search_semantic cache.
+
+    Each row keeps its values in a tuple and shares its field-name tuple with
+    the rows before it, which is roughly half the size of a metadata dict.
+    """
+    rows: Tuple[Tuple[Tuple[str, ...], Tuple[Any, ...]], ...]
+
+    @classmethod
+    def pack(cls, products: List[Dict]) -> "_PackedProducts":
+        rows = []
+        fields: Tuple[str, ...] = ()
+        for product in products:
+            row_fields = tuple(product)
+            if row_fields != fields:
+                fields = row_fields
+            rows.append((fields, tuple(product.values())))
+        return cls(tuple(rows))
+
+    def unpack(self) -> List[Dict]:
+        """Rebuild fresh product dictionaries."""
+        return [dict(zip(fields, values)) for fields, values in self.rows]
+
+
+_search_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _get_search_pool() -> ThreadPoolExecutor:
+    """Get or create the thread pool that runs ChromaDB calls for async callers."""
+    global _search_pool
+    if _search_pool is None:
+        with _clients_lock:
+            if _search_pool is None:
+                _search_pool = ThreadPoolExecutor(
+                    max_workers=SEARCH_POOL_WORKERS, thread_name_prefix="product-search"
+                )
+    return _search_pool
+
+
+async def run_in_search_pool(func, *args, **kwargs):
+    """
+    Run a blocking search call without blocking the event loop.
+
+    Uses a pool reserved for search work, so concurrent tool calls overlap
+    without competing with other asyncio.to_thread users for the default
+    executor.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_search_pool(), functools.partial(func, *args, **kwargs)
+    )
+
+# Default number of search_semantic results kept in the in-process LRU cache
+RESULT_CACHE_SIZE = 512
 
 
 class ProductSearch:
     """Hybrid search product search engine using ChromaDB."""
 
-    def __init__(self, db_path: str = "./chroma_db"):
-        """Initialize the product search with ChromaDB client."""
-        self.client = chromadb.PersistentClient(path=db_path)
+    def __init__(
+        self,
+        db_path: str = "./chroma_db",
+        server_url: Optional[str] = None,
+        cache_size: int = RESULT_CACHE_SIZE
+    ):
+        """
+        Initialize the product search with ChromaDB client.
+
+        Args:
+            db_path: Path to the persistent ChromaDB directory
+            server_url: Optional Chroma server URL (e.g., "http://localhost:8000").
+                        When set, the server is used instead of the local database
+                        and search_semantic_async queries it without blocking.
+            cache_size: Number of search_semantic results to keep in memory
+                        (0 disables the cache)
+        """
+        self.db_path = db_path
+        self.server_url = server_url
+        self.cache_size = cache_size
+        self._result_cache: "OrderedDict[tuple, _PackedProducts]" = OrderedDict()
+        self._result_cache_lock = threading.Lock()
+        self._where_cache: Dict[frozenset, Optional[Dict[str, Any]]] = {}
+        self._where_cache_lock = threading.Lock()
+        self._pending_searches: Dict[tuple, asyncio.Task] = {}
+        self._facets: Optional[Dict[str, Any]] = None
+        self._async_collection = None
+        self._async_loop = None
+        if server_url:
+            self.client = chromadb.HttpClient(**self._server_settings())
+        else:
+            self.client = _get_client(db_path)
+        self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
         self.collection = self.client.get_or_create_collection(
-            name="outdoor_products",
-            metadata={"description": "Outdoor apparel and gear products"}
+            name=COLLECTION_NAME,
+            metadata={"description": "Outdoor apparel and gear products"},
+            configuration=COLLECTION_CONFIGURATION,
+            embedding_function=self.embedding_function
         )
+        _engines.add(self)
+
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embed a query with the collection's embedding function.
+
+        Args:
+            query: Natural language search query
+
+        Returns:
+            Embedding vector for the query
+        """
+        # Chroma returns a float32 array; tolist() yields plain floats, which is
+        # what query_embeddings accepts (np.float32 scalars are rejected)
+        return self.embedding_function([query])[0].tolist()
 
     def search_semantic(
         self,
         query: str,
         n_results: int = 10,
-        filters: Optional[Dict[str, Any]] = None
+        filters: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[List[float]] = None,
+        min_similarity: float = 0.0
     ) -> List[Dict]:
         """
         Semantic search using vector embeddings.
@@ -30,19 +216,216 @@ class ProductSearch:
             query: Natural language search query
             n_results: Number of results to return
             filters: Optional metadata filters (e.g., {"category": "Outerwear"})
+            query_embedding: Optional precomputed embedding of the query
+                             (skips embedding it again)
+            min_similarity: Drop results scoring below this threshold
+                            (0.0-1.0; 0 disables the threshold)
 
         Returns:
             List of product dictionaries
         """
+        key = self._cache_key(query, n_results, filters, min_similarity)
+        cached = self._get_cached_results(key)
+        if cached is not None:
+            return cached
+
+        products = list(self.search_semantic_iter(
+            query, n_results, filters, query_embedding, min_similarity
+        ))
+        self._cache_results(key, products)
+        return products
+
+    def _get_cached_results(self, key: tuple) -> Optional[List[Dict]]:
+        """Return a copy of cached search results, or None on a miss."""
+        with self._result_cache_lock:
+            cached = self._result_cache.get(key)
+            if cached is None:
+                return None
+            self._result_cache.move_to_end(key)
+        return cached.unpack()
+
+    def _cache_results(self, key: tuple, products: List[Dict]) -> None:
+        """Store search results, dropping the least recently used beyond cache_size."""
+        if self.cache_size > 0:
+            with self._result_cache_lock:
+                self._result_cache[key] = _PackedProducts.pack(products)
+                while len(self._result_cache) > self.cache_size:
+                    self._result_cache.popitem(last=False)
+
+    def clear_cache(self) -> None:
+        """Drop cached search results (call after the collection changes)."""
+        with self._result_cache_lock:
+            self._result_cache.clear()
+
+    @staticmethod
+    def _cache_key(
+        query: str,
+        n_results: int,
+        filters: Optional[Dict[str, Any]],
+        min_similarity: float
+    ) -> tuple:
+        """Build a hashable cache key; filters may nest lists and dicts."""
+        filter_key = json.dumps(filters, sort_keys=True) if filters else None
+        return (query, n_results, filter_key, min_similarity)
+
+    def search_semantic_iter(
+        self,
+        query: str,
+        n_results: int = 10,
+        filters: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[List[float]] = None,
+        min_similarity: float = 0.0
+    ) -> Iterator[Dict]:
+        """
+        Semantic search that yields product dictionaries one at a time.
+
+        Takes the same arguments as search_semantic. Products are built
+        lazily from the query result, so a consumer that stops early never
+        pays for formatting the rest.
+
+        Yields:
+            Product dictionaries, best match first
+        """
         where = filters if filters else None
 
+        if query_embedding is not None:
+            results = self.collection.query(
+                query_embeddings=[query_embedding],
+                n_results=n_results,
+                where=where,
+                include=QUERY_INCLUDE
+            )
+        else:
+            results = self.collection.query(
+                query_texts=[query],
+                n_results=n_results,
+                where=where,
+                include=QUERY_INCLUDE
+            )
+
+        yield from self._iter_results(results, min_similarity)
+
+    def search_semantic_batch(
+        self,
+        queries: List[str],
+        n_results: int = 10,
+        filters: Optional[Dict[str, Any]] = None,
+        min_similarity: float = 0.0
+    ) -> List[List[Dict]]:
+        """
+        Semantic search for several queries in one collection query.
+
+        The queries are embedded and searched together, so N queries cost
+        one round trip instead of N.
+
+        Args:
+            queries: Natural language search queries
+            n_results: Number of results to return per query
+            filters: Optional metadata filters applied to every query
+            min_similarity: Drop results scoring below this threshold
+                            (0.0-1.0; 0 disables the threshold)
+
+        Returns:
+            One list of product dictionaries per query, in query order
+        """
+        if not queries:
+            return []
+
         results = self.collection.query(
-            query_texts=[query],
+            query_texts=list(queries),
             n_results=n_results,
-            where=where
+            where=filters if filters else None,
+            include=QUERY_INCLUDE
         )
 
-        return self._format_results(results)
+        return [
+            list(self._iter_results(results, min_similarity, index))
+            for index in range(len(queries))
+        ]
+
+    async def search_semantic_async(
+        self,
+        query: str,
+        n_results: int = 10,
+        filters: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[List[float]] = None,
+        min_similarity: float = 0.0
+    ) -> List[Dict]:
+        """
+        Semantic search that does not block the event loop.
+
+        Takes the same arguments as search_semantic. Against a Chroma server
+        the query is awaited on the async HTTP client; with the local
+        database it runs in a worker thread. Results share the search_semantic
+        cache in both modes, and identical searches issued while one is still
+        in flight on the same event loop wait for it instead of querying again.
+
+        Returns:
+            List of product dictionaries
+        """
+        loop = asyncio.get_running_loop()
+        key = (loop, self._cache_key(query, n_results, filters, min_similarity))
+        pending = self._pending_searches.get(key)
+        if pending is not None:
+            return [dict(product) for product in await asyncio.shield(pending)]
+
+        task = loop.create_task(self._run_semantic_async(
+            query, n_results, filters, query_embedding, min_similarity
+        ))
+        self._pending_searches[key] = task
+        task.add_done_callback(lambda _: self._pending_searches.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _run_semantic_async(
+        self,
+        query: str,
+        n_results: int,
+        filters: Optional[Dict[str, Any]],
+        query_embedding: Optional[List[float]],
+        min_similarity: float
+    ) -> List[Dict]:
+        """Run one search_semantic_async query (no coalescing)."""
+        if not self.server_url:
+            return await run_in_search_pool(
+                self.search_semantic,
+                query, n_results, filters, query_embedding, min_similarity
+            )
+
+        key = self._cache_key(query, n_results, filters, min_similarity)
+        cached = self._get_cached_results(key)
+        if cached is not None:
+            return cached
+
+        if query_embedding is None:
+            query_embedding = await run_in_search_pool(self.embed_query, query)
+        collection = await self._get_async_collection()
+        results = await collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n_results,
+            where=filters if filters else None,
+            include=QUERY_INCLUDE
+        )
+        products = self._format_results(results, min_similarity)
+        self._cache_results(key, products)
+        return products
+
+    def _server_settings(self) -> Dict[str, Any]:
+        """Split server_url into HttpClient/AsyncHttpClient arguments."""
+        url = urlparse(self.server_url)
+        ssl = url.scheme == "https"
+        return {"host": url.hostname, "port": url.port or (443 if ssl else 8000), "ssl": ssl}
+
+    async def _get_async_collection(self):
+        """Get the async collection handle, reconnecting on a new event loop."""
+        loop = asyncio.get_running_loop()
+        if self._async_collection is None or self._async_loop is not loop:
+            client = await chromadb.AsyncHttpClient(**self._server_settings())
+            self._async_collection = await client.get_collection(
+                name=COLLECTION_NAME,
+                embedding_function=self.embedding_function
+            )
+            self._async_loop = loop
+        return self._async_collection
 
     def search_by_filters(
         self,
@@ -64,25 +447,54 @@ class ProductSearch:
         # Check if filters are already in ChromaDB format (contains $and or $or)
         if "$and" in filters or "$or" in filters:
             where_clause = filters
-        # Otherwise, convert simple dict to ChromaDB format
-        elif len(filters) > 1:
-            where_clause = {
-                "$and": [{key: {"$eq": value}} for key, value in filters.items()]
-            }
+        # A single {field: value} pair is already a valid where clause
         elif len(filters) == 1:
-            key, value = list(filters.items())[0]
-            where_clause = {key: {"$eq": value}}
+            where_clause = filters
+        # Otherwise, convert simple dict to ChromaDB format
         else:
-            where_clause = None
+            where_clause = self._where_clause(filters)
 
         # Get all items matching filters
         results = self.collection.get(
             where=where_clause,
-            limit=n_results
+            limit=n_results,
+            include=["metadatas"]
         )
 
         return self._format_get_results(results)
 
+    def _where_clause(self, filters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Translate a multi-field {field: value} dict into an $and where clause.
+
+        Translations are cached by filter contents (oldest dropped first), so
+        repeated tool calls with the same filters reuse one clause. The cache
+        is locked because search_by_filters also runs on the search pool.
+        Callers must not mutate the returned clause.
+        """
+        try:
+            key = frozenset(filters.items())
+        except TypeError:
+            key = None
+        else:
+            with self._where_cache_lock:
+                if key in self._where_cache:
+                    return self._where_cache[key]
+
+        if filters:
+            where_clause = {
+                "$and": [{field: {"$eq": value}} for field, value in filters.items()]
+            }
+        else:
+            where_clause = None
+
+        if key is not None:
+            with self._where_cache_lock:
+                while len(self._where_cache) >= WHERE_CACHE_SIZE:
+                    self._where_cache.pop(next(iter(self._where_cache)), None)
+                self._where_cache[key] = where_clause
+        return where_clause
+
     def hybrid_search(
         self,
         query: str,
@@ -126,32 +538,123 @@ class ProductSearch:
         if not product['documents']:
             return []
 
-        # Use the product's document to find similar items
+        # Use the product's document to find similar items, excluding the
+        # product itself in the query rather than filtering it out afterwards
         results = self.collection.query(
             query_texts=product['documents'],
-            n_results=n_results + 1,  # +1 because it includes itself
+            n_results=n_results,
+            where={"product_id": {"$ne": product_id}},
+            include=QUERY_INCLUDE
         )
 
-        # Remove the original product from results
-        formatted = self._format_results(results)
-        return [p for p in formatted if p['product_id'] != product_id][:n_results]
+        return self._format_results(results)
+
+    def get_facets(self) -> Dict[str, Any]:
+        """
+        Get the catalog facet index (brands and category -> subcategories).
+
+        Loaded from the sidecar file in the ChromaDB directory, and rebuilt
+        from a full scan if the file is missing or was built from another
+        catalog version. Against a Chroma server there is no local sidecar,
+        so the index is built once per engine.
 
-    def _format_results(self, results: Dict) -> List[Dict]:
+        Returns:
+            Dictionary with brands (sorted list), categories (category ->
+            sorted subcategories), and product_count
+        """
+        if self._facets is None:
+            self._facets = self._load_facets()
+        return self._facets
+
+    def refresh_facets(self) -> Dict[str, Any]:
+        """Rebuild the facet index from the collection, persist it, and drop cached results."""
+        self.clear_cache()
+        self._facets = self._build_facets()
+        self._save_facets(self._facets)
+        return self._facets
+
+    def _load_facets(self) -> Dict[str, Any]:
+        """Read the persisted facet index, rebuilding it when stale."""
+        if not self.server_url:
+            try:
+                facets = json.loads((Path(self.db_path) / FACETS_FILENAME).read_text())
+                version = facets.get(CATALOG_VERSION_KEY)
+                # Without a version (a catalog loaded before versioning) the
+                # sidecar can't be checked, so it is rebuilt
+                if version is not None and version == self._catalog_version():
+                    return facets
+            except (OSError, ValueError):
+                pass
+        facets = self._build_facets()
+        self._save_facets(facets)
+        return facets
+
+    def _catalog_version(self) -> Optional[str]:
+        """Read the catalog version load_products stored on the collection."""
+        # Fetched fresh: self.collection's metadata is a snapshot from __init__
+        collection = self.client.get_collection(
+            name=COLLECTION_NAME, embedding_function=self.embedding_function
+        )
+        return (collection.metadata or {}).get(CATALOG_VERSION_KEY)
+
+    def _build_facets(self) -> Dict[str, Any]:
+        """Scan all product metadata and collect brands and categories."""
+        version = self._catalog_version()
+        metadatas = self.collection.get(include=["metadatas"])['metadatas']
+        categories: Dict[str, set] = {}
+        for m in metadatas:
+            categories.setdefault(m['category'], set()).add(m['subcategory'])
+        return {
+            "brands": sorted({m['brand'] for m in metadatas}),
+            "categories": {k: sorted(v) for k, v in categories.items()},
+            "product_count": len(metadatas),
+            CATALOG_VERSION_KEY: version
+        }
+
+    def _save_facets(self, facets: Dict[str, Any]) -> None:
+        """Persist the facet index next to the ChromaDB files (best effort)."""
+        if self.server_url:
+            # The sidecar describes the local database, not the server's
+            return
+        try:
+            (Path(self.db_path) / FACETS_FILENAME).write_text(json.dumps(facets))
+        except OSError:
+            pass
+
+    def _format_results(self, results: Dict, min_similarity: float = 0.0) -> List[Dict]:
         """Format query results into list of product dictionaries."""
-        products = []
-        for metadata, distance in zip(
-            results['metadatas'][0],
-            results['distances'][0]
+        return list(self._iter_results(results, min_similarity))
+
+    def _iter_results(
+        self,
+        results: Dict,
+        min_similarity: float = 0.0,
+        index: int = 0
+    ) -> Iterator[Dict]:
+        """
+        Yield product dictionaries for the index-th query of query results.
+
+        Similarities are computed for the whole row in one array operation.
+        The metadata dicts are fresh per query result, so the score is set on
+        them in place rather than copying each row.
+        """
+        similarities = 1.0 - np.asarray(results['distances'][index], dtype=np.float64)
+        for metadata, similarity in zip(
+            results['metadatas'][index],
+            similarities.tolist()
         ):
-            product = {**metadata, 'similarity_score': 1 - distance}
-            products.append(product)
-        return products
+            # Scores can be negative under L2 distance, so 0 means "no threshold".
+            # Results are ordered by distance, so nothing after this qualifies.
+            if min_similarity > 0 and similarity < min_similarity:
+                break
+            metadata['similarity_score'] = similarity
+            yield metadata
 
     def _format_get_results(self, results: Dict) -> List[Dict]:
         """Format get results into list of product dictionaries."""
-        if not results['metadatas']:
-            return []
-        return list(results['metadatas'])
+        # The metadatas list is built fresh for each get call, so hand it over
+        # as-is instead of copying it
+        return results.get('metadatas') or []
 
 
 def main():
@@ -10,7 +10,10 @@ Each function has:
 """
 
 from typing import List, Dict, Any, Optional
+from src.agents.personalization_agent import _get_agent_instance, infer_climate
 from src.product_search import ProductSearch
+from src.tools.personalization_tools import build_preference_sections
+from src.tools.tool_errors import personalization_tool_errors
 
 # Initialize the search engine (singleton pattern)
 _search_engine = None
@@ -519,7 +522,7 @@ def get_available_brands() -> Dict[str, Any]:
     """
     try:
         search = _get_search_engine()
-        all_products = search.collection.get(limit=1000)
+        all_products = search.collection.get(limit=1000, include=["metadatas"])
         brands = sorted(set(m['brand'] for m in all_products['metadatas']))
 
         return {
@@ -552,7 +555,7 @@ def get_available_categories() -> Dict[str, Any]:
     """
     try:
         search = _get_search_engine()
-        all_products = search.collection.get(limit=1000)
+        all_products = search.collection.get(limit=1000, include=["metadatas"])
 
         categories = {}
         for m in all_products['metadatas']:
@@ -603,7 +606,7 @@ def get_catalog_statistics() -> Dict[str, Any]:
     """
     try:
         search = _get_search_engine()
-        all_products = search.collection.get(limit=1000)
+        all_products = search.collection.get(limit=1000, include=["metadatas"])
         metadata_list = all_products['metadatas']
 
         from collections import Counter
@@ -647,24 +650,19 @@ def get_catalog_statistics() -> Dict[str, Any]:
 # PERSONALIZATION & MEMORY TOOLS
 # ============================================================================
 
-# Initialize personalization agent (singleton pattern)
-_personalization_agent = None
-
-
 def _get_personalization_agent():
-    """Get or create the PersonalizationAgent instance."""
-    global _personalization_agent
-    if _personalization_agent is None:
-        try:
-            from src.agents.personalization_agent import PersonalizationAgent
-            _personalization_agent = PersonalizationAgent()
-        except Exception as e:
-            raise RuntimeError(
-                f"Failed to initialize PersonalizationAgent. Error: {e}"
-            ) from e
-    return _personalization_agent
+    """Get the shared PersonalizationAgent instance."""
+    try:
+        return _get_agent_instance()
+    except Exception as e:
+        raise RuntimeError(
+            f"Failed to initialize PersonalizationAgent. Error: {e}"
+        ) from e
 
 
+@personalization_tool_errors(
+    lambda user_name, location=None: {"is_new": True, "user_id": user_name}
+)
 def identify_user(user_name: str, location: Optional[str] = None) -> Dict[str, Any]:
     """
     Identify a user and check if they have saved preferences.
@@ -689,36 +687,29 @@ def identify_user(user_name: str, location: Optional[str] = None) -> Dict[str, A
         result = identify_user("sarah", location="Australia")
         result = identify_user("john", location="Minnesota")  # Infers cold climate
     """
-    try:
-        agent = _get_personalization_agent()
-        result = agent.identify_user(user_name)
-
-        # If location provided, save it
-        if location:
-            from src.agents.personalization_agent import infer_climate
-            location_data = {"city": location}
-            climate = infer_climate(city=location)
-            if climate:
-                location_data["climate"] = climate
-
-            # Save location to user preferences
-            agent.save_user_preferences(
-                user_id=result["user_id"],
-                location=location_data,
-                permanent=True
-            )
-            result["location_saved"] = True
-            result["location"] = location_data
-
-        return result
-    except Exception as e:
-        return {
-            "is_new": True,
-            "user_id": user_name,
-            "error": str(e)
-        }
+    agent = _get_personalization_agent()
+    result = agent.identify_user(user_name)
+
+    # If location provided, save it
+    if location:
+        location_data = {"city": location}
+        climate = infer_climate(city=location)
+        if climate:
+            location_data["climate"] = climate
+
+        # Save location to user preferences
+        agent.save_user_preferences(
+            user_id=result["user_id"],
+            location=location_data,
+            permanent=True
+        )
+        result["location_saved"] = True
+        result["location"] = location_data
+
+    return result
 
 
+@personalization_tool_errors({})
 def get_user_preferences(user_id: str) -> Dict[str, Any]:
     """
     Get saved preferences for a user.
@@ -736,13 +727,10 @@ def get_user_preferences(user_id: str) -> Dict[str, Any]:
         prefs = get_user_preferences("sarah")
         print(f"Sarah prefers {prefs['sizing']['fit']} fit")
     """
-    try:
-        agent = _get_personalization_agent()
-        return agent.get_user_preferences(user_id)
-    except Exception as e:
-        return {"error": str(e)}
+    return _get_personalization_agent().get_user_preferences(user_id)
 
 
+@personalization_tool_errors({"success": False})
 def save_user_preferences(
     user_id: str,
     fit: Optional[str] = None,
@@ -792,58 +780,31 @@ def save_user_preferences(
             permanent=True
         )
     """
-    try:
-        agent = _get_personalization_agent()
-
-        # Build preference structures
-        sizing = {}
-        if fit:
-            sizing["fit"] = fit
-        if shirt_size:
-            sizing["shirt"] = shirt_size
-        if pants_size:
-            sizing["pants"] = pants_size
-        if shoe_size:
-            sizing["shoes"] = shoe_size
-
-        preferences = {}
-        if outerwear_colors or outerwear_style:
-            preferences["outerwear"] = {}
-            if outerwear_colors:
-                preferences["outerwear"]["colors"] = outerwear_colors
-            if outerwear_style:
-                preferences["outerwear"]["style"] = outerwear_style
-        if footwear_colors:
-            preferences["footwear"] = {"colors": footwear_colors}
-
-        general = {}
-        if budget_max:
-            general["budget_max"] = budget_max
-        if brands_liked:
-            general["brands_liked"] = brands_liked
-
-        # Build location dict with climate inference
-        location_data = None
-        if location:
-            location_data = {"city": location}
-            # Infer climate from location using module-level function
-            from src.agents.personalization_agent import infer_climate
-            climate = infer_climate(city=location)
-            if climate:
-                location_data["climate"] = climate
-
-        return agent.save_user_preferences(
-            user_id=user_id,
-            sizing=sizing if sizing else None,
-            preferences=preferences if preferences else None,
-            general=general if general else None,
-            location=location_data,
-            permanent=permanent
-        )
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+    arguments = locals()
+    agent = _get_personalization_agent()
+
+    sizing, preferences, general = build_preference_sections(arguments)
+
+    # Build location dict with climate inference
+    location_data = None
+    if location:
+        location_data = {"city": location}
+        # Infer climate from location using module-level function
+        climate = infer_climate(city=location)
+        if climate:
+            location_data["climate"] = climate
+
+    return agent.save_user_preferences(
+        user_id=user_id,
+        sizing=sizing if sizing else None,
+        preferences=preferences if preferences else None,
+        general=general if general else None,
+        location=location_data,
+        permanent=permanent
+    )
 
 
+@personalization_tool_errors({"success": False})
 def record_user_feedback(
     user_id: str,
     feedback: str,
@@ -874,13 +835,10 @@ def record_user_feedback(
         # Returns: {"signals": [{"type": "avoid_style", "value": "bright_colors"}],
         #          "actions": ["I'll recommend more neutral/muted colors"]}
     """
-    try:
-        agent = _get_personalization_agent()
-        return agent.process_feedback(user_id, feedback, context)
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+    return _get_personalization_agent().process_feedback(user_id, feedback, context)
 
 
+@personalization_tool_errors({"has_preferences": False, "prompt": None})
 def get_returning_user_prompt(user_id: str) -> Dict[str, Any]:
     """
     Get a prompt to ask a returning user about their preferences.
@@ -904,15 +862,11 @@ def get_returning_user_prompt(user_id: str) -> Dict[str, Any]:
         if result['has_preferences']:
             # Show result['prompt'] to user
     """
-    try:
-        agent = _get_personalization_agent()
-        prompt = agent.get_returning_user_prompt(user_id)
-        return {
-            "has_preferences": prompt is not None,
-            "prompt": prompt
-        }
-    except Exception as e:
-        return {"has_preferences": False, "prompt": None, "error": str(e)}
+    prompt = _get_personalization_agent().get_returning_user_prompt(user_id)
+    return {
+        "has_preferences": prompt is not None,
+        "prompt": prompt
+    }
 
 
 def get_outfit_recommendation(
@@ -967,19 +921,18 @@ def get_outfit_recommendation(
         outfit_categories = {}
         all_products = []
 
-        for search_config in outfit_result["search_parameters"]["outfit_searches"]:
-            category = search_config["category"]
-            keywords = " ".join(search_config.get("query_keywords", []))
-            filters = search_config.get("filters", {})
+        outfit_searches = outfit_result["search_parameters"]["outfit_searches"]
 
-            # Build search query
-            search_query = f"{keywords} {category}"
+        # Build one search query per category and run them as a single batch
+        search_queries = [
+            f"{' '.join(search_config.get('query_keywords', []))} {search_config['category']}"
+            for search_config in outfit_searches
+        ]
+        batch_results = search_engine.search_semantic_batch(search_queries, n_results=5)
 
-            # Search semantically
-            products = search_engine.search_semantic(
-                query=search_query,
-                n_results=5
-            )
+        for search_config, products in zip(outfit_searches, batch_results):
+            category = search_config["category"]
+            filters = search_config.get("filters", {})
 
             # Apply filters
             filtered_products = _apply_outfit_filters(products, filters)
@@ -1052,20 +1005,23 @@ def _apply_outfit_filters(products: List[Dict], filters: Dict) -> List[Dict]:
 
 def _generate_outfit_message(context: Dict, outfit_items: Dict) -> str:
     """Generate natural language response for outfit recommendation."""
-    parts = []
-
     activity = context.get("activity", "unknown")
     weather = context.get("weather", "unknown")
+    has_activity = activity != "unknown"
+    has_weather = weather != "unknown"
+
+    # At most two intro parts, so pick the phrasing directly instead of joining a list
+    if has_activity and has_weather:
+        intro = f"For {activity} in {weather} weather"
+    elif has_activity:
+        intro = f"For {activity}"
+    elif has_weather:
+        intro = f"in {weather} weather"
+    else:
+        intro = "Here's a recommended outfit"
 
-    if activity != "unknown":
-        parts.append(f"For {activity}")
-    if weather != "unknown":
-        parts.append(f"in {weather} weather")
-
-    intro = " ".join(parts) if parts else "Here's a recommended outfit"
-
-    categories_found = list(outfit_items.keys())
-    total_items = sum(len(items) for items in outfit_items.values())
+    categories_found = list(outfit_items)
+    total_items = sum(map(len, outfit_items.values()))
 
     if total_items > 0:
         cat_list = ', '.join(categories_found)
@@ -5,22 +5,17 @@ These functions handle user identification, preference management,
 and feedback processing.
 """
 
-from typing import List, Dict, Any, Optional
-
-
-# Initialize personalization agent (singleton pattern)
-_personalization_agent = None
+from typing import Any, Dict, List, Optional, Tuple
+from src.agents.personalization_agent import _get_agent_instance
+from src.tools.tool_errors import personalization_tool_errors
 
 
 def _get_personalization_agent():
-    """Get or create the PersonalizationAgent instance."""
-    global _personalization_agent
-    if _personalization_agent is None:
-        from src.agents.personalization_agent import PersonalizationAgent
-        _personalization_agent = PersonalizationAgent()
-    return _personalization_agent
+    """Get the shared PersonalizationAgent instance."""
+    return _get_agent_instance()
 
 
+@personalization_tool_errors(lambda user_name: {"is_new": True, "user_id": user_name})
 def identify_user(user_name: str) -> Dict[str, Any]:
     """
     Identify a user and check if they have saved preferences.
@@ -45,17 +40,11 @@ def identify_user(user_name: str) -> Dict[str, Any]:
         else:
             # Show saved preferences and ask for confirmation
     """
-    try:
-        agent = _get_personalization_agent()
-        return agent.identify_user(user_name)
-    except Exception as e:
-        return {
-            "is_new": True,
-            "user_id": user_name,
-            "error": str(e)
-        }
+    agent = _get_personalization_agent()
+    return agent.identify_user(user_name)
 
 
+@personalization_tool_errors({})
 def get_user_preferences(user_id: str) -> Dict[str, Any]:
     """
     Get saved preferences for a user.
@@ -73,13 +62,50 @@ def get_user_preferences(user_id: str) -> Dict[str, Any]:
         prefs = get_user_preferences("sarah")
         print(f"Sarah prefers {prefs['sizing']['fit']} fit")
     """
-    try:
-        agent = _get_personalization_agent()
-        return agent.get_user_preferences(user_id)
-    except Exception as e:
-        return {"error": str(e)}
+    agent = _get_personalization_agent()
+    return agent.get_user_preferences(user_id)
+
+
+# Where each save_user_preferences argument is stored: (section, key, ...)
+PREFERENCE_FIELDS = {
+    "fit": ("sizing", "fit"),
+    "shirt_size": ("sizing", "shirt"),
+    "pants_size": ("sizing", "pants"),
+    "shoe_size": ("sizing", "shoes"),
+    "outerwear_colors": ("preferences", "outerwear", "colors"),
+    "outerwear_style": ("preferences", "outerwear", "style"),
+    "footwear_colors": ("preferences", "footwear", "colors"),
+    "budget_max": ("general", "budget_max"),
+    "brands_liked": ("general", "brands_liked"),
+}
+
+
+def build_preference_sections(
+    arguments: Dict[str, Any]
+) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+    """
+    Split save_user_preferences arguments into memory sections.
 
+    Args:
+        arguments: The tool's arguments (e.g. its locals()); names missing
+                   from PREFERENCE_FIELDS and empty values are skipped
 
+    Returns:
+        (sizing, preferences, general) dictionaries
+    """
+    sections: Dict[str, Dict[str, Any]] = {"sizing": {}, "preferences": {}, "general": {}}
+    for param, path in PREFERENCE_FIELDS.items():
+        value = arguments.get(param)
+        if not value:
+            continue
+        target = sections
+        for key in path[:-1]:
+            target = target.setdefault(key, {})
+        target[path[-1]] = value
+    return sections["sizing"], sections["preferences"], sections["general"]
+
+
+@personalization_tool_errors({"success": False})
 def save_user_preferences(
     user_id: str,
     fit: Optional[str] = None,
@@ -126,47 +152,21 @@ def save_user_preferences(
             permanent=True
         )
     """
-    try:
-        agent = _get_personalization_agent()
-
-        # Build preference structures
-        sizing = {}
-        if fit:
-            sizing["fit"] = fit
-        if shirt_size:
-            sizing["shirt"] = shirt_size
-        if pants_size:
-            sizing["pants"] = pants_size
-        if shoe_size:
-            sizing["shoes"] = shoe_size
-
-        preferences = {}
-        if outerwear_colors or outerwear_style:
-            preferences["outerwear"] = {}
-            if outerwear_colors:
-                preferences["outerwear"]["colors"] = outerwear_colors
-            if outerwear_style:
-                preferences["outerwear"]["style"] = outerwear_style
-        if footwear_colors:
-            preferences["footwear"] = {"colors": footwear_colors}
-
-        general = {}
-        if budget_max:
-            general["budget_max"] = budget_max
-        if brands_liked:
-            general["brands_liked"] = brands_liked
-
-        return agent.save_user_preferences(
-            user_id=user_id,
-            sizing=sizing if sizing else None,
-            preferences=preferences if preferences else None,
-            general=general if general else None,
-            permanent=permanent
-        )
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+    arguments = locals()
+    agent = _get_personalization_agent()
+
+    sizing, preferences, general = build_preference_sections(arguments)
+
+    return agent.save_user_preferences(
+        user_id=user_id,
+        sizing=sizing if sizing else None,
+        preferences=preferences if preferences else None,
+        general=general if general else None,
+        permanent=permanent
+    )
 
 
+@personalization_tool_errors({"success": False})
 def record_user_feedback(
     user_id: str,
     feedback: str,
@@ -197,13 +197,11 @@ def record_user_feedback(
         # Returns: {"signals": [{"type": "avoid_style", "value": "bright_colors"}],
         #          "actions": ["I'll recommend more neutral/muted colors"]}
     """
-    try:
-        agent = _get_personalization_agent()
-        return agent.process_feedback(user_id, feedback, context)
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+    agent = _get_personalization_agent()
+    return agent.process_feedback(user_id, feedback, context)
 
 
+@personalization_tool_errors({"has_preferences": False, "prompt": None})
 def get_returning_user_prompt(user_id: str) -> Dict[str, Any]:
     """
     Get a prompt to ask a returning user about their preferences.
@@ -227,12 +225,9 @@ def get_returning_user_prompt(user_id: str) -> Dict[str, Any]:
         if result['has_preferences']:
             # Show result['prompt'] to user
     """
-    try:
-        agent = _get_personalization_agent()
-        prompt = agent.get_returning_user_prompt(user_id)
-        return {
-            "has_preferences": prompt is not None,
-            "prompt": prompt
-        }
-    except Exception as e:
-        return {"has_preferences": False, "prompt": None, "error": str(e)}
+    agent = _get_personalization_agent()
+    prompt = agent.get_returning_user_prompt(user_id)
+    return {
+        "has_preferences": prompt is not None,
+        "prompt": prompt
+    }
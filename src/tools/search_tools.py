@@ -4,8 +4,10 @@ Product search tool functions for the ProductSearchAgent.
 These functions handle product search, filtering, and catalog information.
 """
 
-from typing import Dict, Any, Optional
-from src.product_search import ProductSearch
+import functools
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Optional
+from src.product_search import ProductSearch, register_catalog_cache, run_in_search_pool
 
 
 # Initialize the search engine (singleton pattern)
@@ -33,7 +35,8 @@ def _get_search_engine() -> ProductSearch:
 def search_products(
     query: str,
     max_results: int = 10,
-    min_similarity: float = 0.0
+    min_similarity: float = 0.0,
+    category: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Search for products using natural language query (semantic search).
@@ -49,6 +52,8 @@ def search_products(
         max_results: Maximum number of products to return (1-50, default: 10)
         min_similarity: Minimum similarity score threshold (0.0-1.0, default: 0.0)
                        Higher values return only very similar products
+        category: Optional category to restrict results to (e.g., "Outerwear").
+                  Applied inside ChromaDB, so only matching products are returned
 
     Returns:
         Dictionary containing:
@@ -64,7 +69,10 @@ def search_products(
     """
     try:
         search = _get_search_engine()
-        results = search.search_semantic(query, n_results=min(max_results, 50))
+        filters = {"category": category} if category else None
+        results = search.search_semantic(
+            query, n_results=min(max_results, 50), filters=filters
+        )
 
         # Filter by similarity threshold
         if min_similarity > 0:
@@ -453,6 +461,34 @@ def find_similar_products(
 # CATALOG INFORMATION TOOLS
 # ============================================================================
 
+@functools.lru_cache(maxsize=1024)
+def _get_product_metadata_cached(product_id: str) -> Mapping[str, Any]:
+    """
+    Fetch a product's metadata from ChromaDB, memoized per product ID.
+
+    The cached value is a read-only view so callers can't corrupt it; they
+    receive a fresh dict copy from get_product_details. Missing products
+    raise KeyError, which lru_cache does not memoize.
+
+    Note: the cache is per-process. Multi-worker deployments each hold
+    their own copy and need a shared store (e.g. Redis) for consistency.
+    """
+    search = _get_search_engine()
+    result = search.collection.get(
+        ids=[product_id],
+        include=["metadatas"]
+    )
+    if not result['metadatas']:
+        raise KeyError(product_id)
+    return MappingProxyType(dict(result['metadatas'][0]))
+
+
+@register_catalog_cache
+def clear_product_details_cache():
+    """Clear cached product details (run by invalidate_catalog after a reload)."""
+    _get_product_metadata_cached.cache_clear()
+
+
 def get_product_details(product_id: str) -> Dict[str, Any]:
     """
     Get detailed information about a specific product by its ID.
@@ -472,18 +508,13 @@ def get_product_details(product_id: str) -> Dict[str, Any]:
             print(result['product']['product_name'])
     """
     try:
-        search = _get_search_engine()
-        result = search.collection.get(
-            ids=[product_id],
-            include=["metadatas"]
-        )
-
-        if result['metadatas']:
-            return {
-                "success": True,
-                "product_id": product_id,
-                "product": result['metadatas'][0]
-            }
+        product = dict(_get_product_metadata_cached(product_id))
+        return {
+            "success": True,
+            "product_id": product_id,
+            "product": product
+        }
+    except KeyError:
         return {
             "success": False,
             "product_id": product_id,
@@ -499,6 +530,27 @@ def get_product_details(product_id: str) -> Dict[str, Any]:
         }
 
 
+async def get_product_details_async(product_id: str) -> Dict[str, Any]:
+    """
+    Async variant of get_product_details for use inside async agent tools.
+
+    The ChromaDB lookup runs in the search thread pool, so several lookups can be
+    fanned out concurrently with asyncio.gather.
+
+    Args:
+        product_id: The product ID (e.g., "PRD-6A6DD909")
+
+    Returns:
+        Same dictionary as get_product_details
+
+    Example:
+        results = await asyncio.gather(
+            *(get_product_details_async(pid) for pid in ["PRD-001", "PRD-002"])
+        )
+    """
+    return await run_in_search_pool(get_product_details, product_id)
+
+
 def get_available_brands() -> Dict[str, Any]:
     """
     Get list of all available brands in the catalog.
@@ -515,8 +567,7 @@ def get_available_brands() -> Dict[str, Any]:
     """
     try:
         search = _get_search_engine()
-        all_products = search.collection.get(limit=1000)
-        brands = sorted(set(m['brand'] for m in all_products['metadatas']))
+        brands = search.get_facets()['brands']
 
         return {
             "success": True,
@@ -548,18 +599,7 @@ def get_available_categories() -> Dict[str, Any]:
     """
     try:
         search = _get_search_engine()
-        all_products = search.collection.get(limit=1000)
-
-        categories = {}
-        for m in all_products['metadatas']:
-            cat = m['category']
-            subcat = m['subcategory']
-            if cat not in categories:
-                categories[cat] = set()
-            categories[cat].add(subcat)
-
-        # Convert sets to sorted lists
-        categories = {k: sorted(list(v)) for k, v in categories.items()}
+        categories = search.get_facets()['categories']
 
         return {
             "success": True,
@@ -599,7 +639,7 @@ def get_catalog_statistics() -> Dict[str, Any]:
     """
     try:
         search = _get_search_engine()
-        all_products = search.collection.get(limit=1000)
+        all_products = search.collection.get(limit=1000, include=["metadatas"])
         metadata_list = all_products['metadatas']
 
         from collections import Counter
@@ -0,0 +1,32 @@
+"""
+Error handling shared by the personalization tool functions.
+
+Both personalization_tools and agent_tools expose the same personalization
+tools to their agents; this module gives them one way to turn a raised
+exception into a structured error result.
+"""
+
+import functools
+from typing import Any, Callable, Dict, Union
+
+
+def personalization_tool_errors(
+    error_result: Union[Dict[str, Any], Callable[..., Dict[str, Any]]]
+):
+    """
+    Return error_result plus the error message when the wrapped tool raises.
+
+    error_result may also be a callable, given the tool's arguments, for
+    results that echo them back. functools.wraps keeps the tool's signature
+    and docstring, which the agent framework reads to build the tool schema.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                result = error_result(*args, **kwargs) if callable(error_result) else error_result
+                return {**result, "error": str(e)}
+        return wrapper
+    return decorator
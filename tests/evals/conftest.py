@@ -55,9 +55,13 @@ async def search_agent():
 @pytest_asyncio.fixture(scope="module")
 async def advisor_agent():
     """Create ProductAdvisorAgent for evals."""
-    from src.agents.product_advisor_agent import create_product_advisor_agent
+    from src.agents.product_advisor_agent import (
+        close_product_advisor_agent,
+        create_product_advisor_agent
+    )
     agent = await create_product_advisor_agent()
-    return agent
+    yield agent
+    await close_product_advisor_agent(agent)
 
 
 @pytest.fixture
@@ -0,0 +1,58 @@
+"""
+Unit tests for the PersonalizationAgent's rule-based query parsing.
+
+These cover the non-LLM path: extracting activity, weather, budget and
+colors from a query, without creating a chat client.
+"""
+
+import pytest
+
+from src.agents import personalization_agent
+
+
+QUERIES = [
+    "warm jacket for skiing under $300",
+    "Warm   jacket for SKIING under $300",
+    "lightweight rain shell in blue or black",
+    "casual outfit for the city",
+    "warm jacket for skiing under $300",
+]
+
+
+@pytest.fixture
+def agent(memory_instance, monkeypatch):
+    """PersonalizationAgent backed by temporary memory storage."""
+    monkeypatch.setattr(personalization_agent, "get_memory", lambda: memory_instance)
+    return personalization_agent.PersonalizationAgent()
+
+
+class TestParseQueryContexts:
+    """Tests for batch query parsing."""
+
+    def test_matches_single_query_parse(self, agent):
+        """Each batch result should equal parsing that query on its own."""
+        contexts = personalization_agent.parse_query_contexts(QUERIES)
+
+        assert len(contexts) == len(QUERIES)
+        for query, context in zip(QUERIES, contexts):
+            assert context == agent._parse_query_context(query)
+
+    def test_duplicates_parsed_once(self):
+        """Queries equal after normalization should share one parse."""
+        personalization_agent._parse_query_cached.cache_clear()
+
+        personalization_agent.parse_query_contexts(QUERIES)
+
+        info = personalization_agent._parse_query_cached.cache_info()
+        assert info.misses == 3
+        assert info.hits == 2
+
+    def test_results_are_independent(self):
+        """Mutating one returned context should not affect a duplicate's."""
+        first, _, _, _, last = personalization_agent.parse_query_contexts(QUERIES)
+
+        first["colors"].append("neon")
+        first["budget"] = 1
+
+        assert "neon" not in last["colors"]
+        assert last["budget"] != 1
@@ -8,8 +8,13 @@ Tests the non-LLM search component that handles:
 - Similar product finding
 """
 
+import json
+from pathlib import Path
+
 import pytest
 
+from src.product_search import CATALOG_VERSION_KEY, FACETS_FILENAME, invalidate_catalog
+
 
 class TestSemanticSearch:
     """Tests for semantic (vector) search functionality."""
@@ -51,6 +56,47 @@ class TestSemanticSearch:
         scores = [p["similarity_score"] for p in results]
         assert scores == sorted(scores, reverse=True)
 
+    def test_semantic_search_min_similarity(self, search_engine):
+        """min_similarity should drop lower-scoring results without reordering."""
+        unfiltered = search_engine.search_semantic("hiking boots", n_results=10)
+        # Scores can be negative under L2 distance, so take one near the top
+        threshold = unfiltered[2]["similarity_score"]
+        assert threshold > 0
+
+        results = search_engine.search_semantic(
+            "hiking boots", n_results=10, min_similarity=threshold
+        )
+
+        assert 0 < len(results) <= len(unfiltered)
+        assert all(p["similarity_score"] >= threshold for p in results)
+        assert results == unfiltered[:len(results)]
+
+    def test_semantic_search_iter_matches_list(self, search_engine):
+        """search_semantic_iter should yield the same products as search_semantic."""
+        results = search_engine.search_semantic("rain jacket", n_results=5)
+        streamed = list(search_engine.search_semantic_iter("rain jacket", n_results=5))
+
+        assert streamed == results
+
+    def test_semantic_search_batch_matches_single(self, search_engine):
+        """search_semantic_batch should return one result list per query, in order."""
+        queries = ["rain jacket", "hiking boots"]
+        batched = search_engine.search_semantic_batch(queries, n_results=5)
+
+        assert len(batched) == len(queries)
+        for query, results in zip(queries, batched):
+            assert results == search_engine.search_semantic(query, n_results=5)
+
+    def test_semantic_search_cache_returns_copies(self, search_engine):
+        """Repeated searches should hit the cache without sharing result dicts."""
+        first = search_engine.search_semantic("warm jacket", n_results=3)
+        first[0]["product_name"] = "mutated"
+        second = search_engine.search_semantic("warm jacket", n_results=3)
+
+        assert second[0]["product_name"] != "mutated"
+        search_engine.clear_cache()
+        assert search_engine.search_semantic("warm jacket", n_results=3) == second
+
 
 class TestFilterSearch:
     """Tests for filter-based (metadata) search functionality."""
@@ -117,6 +163,16 @@ class TestFilterSearch:
         for product in results:
             assert product["category"] == "Outerwear"
 
+    def test_filter_single_key_matches_eq(self, search_engine):
+        """A single {field: value} filter should match the explicit $eq form."""
+        shorthand = search_engine.search_by_filters(filters={"gender": "Women"}, n_results=20)
+        explicit = search_engine.search_by_filters(
+            filters={"gender": {"$eq": "Women"}},
+            n_results=20
+        )
+
+        assert shorthand == explicit
+
 
 class TestHybridSearch:
     """Tests for hybrid search (semantic + filters)."""
@@ -214,6 +270,32 @@ class TestCatalogInfo:
         categories = {k: sorted(list(v)) for k, v in categories.items()}
         assert "Outerwear" in categories or "Footwear" in categories
 
+    def test_facets_match_full_scan(self, search_engine):
+        """Facet index should list the same brands and categories as a full scan."""
+        metadatas = search_engine.collection.get(include=["metadatas"])["metadatas"]
+
+        facets = search_engine.get_facets()
+
+        assert facets["brands"] == sorted(set(m["brand"] for m in metadatas))
+        assert set(facets["categories"]) == set(m["category"] for m in metadatas)
+        assert facets["product_count"] == len(metadatas)
+
+    def test_facets_rebuilt_for_other_catalog_version(self, search_engine):
+        """A sidecar built from another catalog should not be served, even at the same size."""
+        stale = {**search_engine.get_facets(), "brands": ["Stale"], CATALOG_VERSION_KEY: "stale"}
+        (Path(search_engine.db_path) / FACETS_FILENAME).write_text(json.dumps(stale))
+        search_engine._facets = None
+
+        assert search_engine.get_facets()["brands"] != ["Stale"]
+
+    def test_invalidate_catalog_drops_cached_results(self, search_engine):
+        """invalidate_catalog should clear every live engine's result cache."""
+        search_engine.search_semantic("warm jacket", n_results=3)
+
+        invalidate_catalog()
+
+        assert len(search_engine._result_cache) == 0
+
 
 class TestEdgeCases:
     """Tests for edge cases and error handling."""
@@ -0,0 +1,143 @@
+"""
+Unit tests for the ProductSearchAgent's search tools.
+
+The tools are built by _build_product_search_agent with a stand-in chat
+client that only records them, so they run against the real ChromaDB
+without any LLM calls. Each tool returns its result as a JSON string.
+"""
+
+import json
+
+import pytest
+
+from src.agents import product_search_agent
+
+
+class _RecordingChatClient:
+    """Chat client stand-in that captures the tools passed to create_agent."""
+
+    def __init__(self):
+        self.tools = {}
+
+    def create_agent(self, instructions, tools):
+        self.tools = {tool.__name__: tool for tool in tools}
+        return object()
+
+
+@pytest.fixture
+def agent_tools(search_engine, monkeypatch):
+    """Search agent tools by name, bound to the real ProductSearch."""
+    client = _RecordingChatClient()
+    monkeypatch.setattr(product_search_agent, "_get_chat_client", lambda: client)
+    monkeypatch.setattr(product_search_agent, "_get_search_engine", lambda: search_engine)
+    search_engine.clear_cache()
+    product_search_agent._build_product_search_agent()
+    yield client.tools
+    search_engine.clear_cache()
+
+
+async def _call(tools, name, *args, **kwargs):
+    return json.loads(await tools[name](*args, **kwargs))
+
+
+class TestSearchTools:
+    """Tests for the semantic search tools."""
+
+    @pytest.mark.asyncio
+    async def test_search_products(self, agent_tools):
+        """search_products should return projected products with scores."""
+        result = await _call(agent_tools, "search_products", "warm jacket", max_results=5)
+
+        assert result["success"] is True, result.get("error")
+        assert result["total_results"] == len(result["products"]) > 0
+        for product in result["products"]:
+            assert "similarity_score" in product
+            assert "waterproofing" not in product
+
+    @pytest.mark.asyncio
+    async def test_search_products_extra_fields(self, agent_tools):
+        """fields should add attributes outside the default projection."""
+        result = await _call(
+            agent_tools, "search_products", "rain jacket",
+            max_results=3, fields=["waterproofing"]
+        )
+
+        assert result["success"] is True, result.get("error")
+        assert all("waterproofing" in p for p in result["products"])
+
+    @pytest.mark.asyncio
+    async def test_search_with_filters(self, agent_tools):
+        """search_with_filters should only return products matching the filters."""
+        result = await _call(
+            agent_tools, "search_with_filters", "warm jacket", gender="Women", max_results=5
+        )
+
+        assert result["success"] is True, result.get("error")
+        assert len(result["products"]) > 0
+        assert all(p["gender"] == "Women" for p in result["products"])
+
+    @pytest.mark.asyncio
+    async def test_cache_does_not_mix_similar_queries(self, agent_tools, search_engine):
+        """Queries differing in one word should not share cached results."""
+        women = await _call(agent_tools, "search_products", "women's rain jacket")
+        men = await _call(agent_tools, "search_products", "men's rain jacket")
+
+        assert women["query"] == "women's rain jacket"
+        assert men["query"] == "men's rain jacket"
+        assert len(search_engine._result_cache) == 2
+
+    @pytest.mark.asyncio
+    async def test_cache_shared_across_case_and_spacing(self, agent_tools, search_engine):
+        """Queries equal after normalization should share one cached result."""
+        first = await _call(agent_tools, "search_products", "women's rain jacket")
+        second = await _call(agent_tools, "search_products", "  Women's   RAIN jacket")
+
+        assert second["query"] == "  Women's   RAIN jacket"
+        assert second["products"] == first["products"]
+        assert len(search_engine._result_cache) == 1
+
+
+class TestCatalogTools:
+    """Tests for the filter, similarity, and details tools."""
+
+    @pytest.mark.asyncio
+    async def test_filter_products_by_attributes(self, agent_tools):
+        """Attribute filters should be applied exactly."""
+        result = await _call(agent_tools, "filter_products_by_attributes", brand="NorthPeak")
+
+        assert result["success"] is True, result.get("error")
+        assert len(result["products"]) > 0
+        assert all(p["brand"] == "NorthPeak" for p in result["products"])
+
+    @pytest.mark.asyncio
+    async def test_filter_products_requires_filters(self, agent_tools):
+        """Calling the filter tool without filters should fail cleanly."""
+        result = await _call(agent_tools, "filter_products_by_attributes")
+
+        assert result["success"] is False
+        assert result["error"] == "No filters specified."
+
+    @pytest.mark.asyncio
+    async def test_find_similar_products(self, agent_tools, search_engine):
+        """Similar products should exclude the reference product."""
+        product_id = search_engine.search_semantic("jacket", n_results=1)[0]["product_id"]
+
+        result = await _call(agent_tools, "find_similar_products", product_id, max_results=5)
+
+        assert result["success"] is True, result.get("error")
+        assert len(result["products"]) == 5
+        assert all(p["product_id"] != product_id for p in result["products"])
+
+    @pytest.mark.asyncio
+    async def test_get_product_details_batch(self, agent_tools, search_engine):
+        """Batch details should dedupe IDs and report missing ones."""
+        product_id = search_engine.search_semantic("boots", n_results=1)[0]["product_id"]
+
+        result = await _call(
+            agent_tools, "get_product_details_batch", [product_id, product_id, "PRD-MISSING"]
+        )
+
+        assert result["success"] is True
+        assert list(result["products"]) == [product_id]
+        assert result["missing"] == ["PRD-MISSING"]
+
@@ -47,6 +47,12 @@ class TestProductCard:
         assert "Waterproofing" in content or "Waterproof" in content
         assert "Insulation" in content or "Down" in content
 
+    def test_product_card_half_stars(self, visual_agent, sample_product):
+        """Ratings should round down to the nearest half star."""
+        for rating, stars in [(4.7, "⭐⭐⭐⭐½"), (4.4, "⭐⭐⭐⭐"), (5.0, "⭐⭐⭐⭐⭐")]:
+            result = visual_agent.create_product_card({**sample_product, "rating": rating})
+            assert f"**Rating:** {rating}/5.0 {stars}\n" in result["content"]
+
 
 class TestComparisonTable:
     """Tests for comparison table generation."""